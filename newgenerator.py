@@ -1,12 +1,44 @@
 import streamlit as st
+from streamlit.errors import StreamlitAPIException
 from ortools.sat.python import cp_model
 from typing import Dict, List, Tuple, Any
 import json
+import hashlib
 import pandas as pd
+import numpy as np
+import functools
+import operator
+import heapq
+from collections import Counter, defaultdict
 import sqlite3
 import tempfile
 import os
 from datetime import datetime
+from solver_kernels import slot_start_hours, allowed_start_mask
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; reports fall back to the json module
+    orjson = None
+
+try:
+    import pyarrow
+except ImportError:  # pyarrow is optional; query results then use pandas' default dtypes
+    pyarrow = None
+
+# Year and day keys used throughout (string literals, so already interned)
+YEARS = ("Year1", "Year2", "Year3", "Year4")
+DAYS = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
+DAY_KEYS = tuple(day.lower() for day in DAYS)  # per-day keys of a generated timetable
+DAY_ORDER = pd.CategoricalDtype(DAY_KEYS, ordered=True)  # sorts/reindexes day columns Monday..Sunday
+
+# Objective weights for soft (preference) constraints
+SOFT_CONSTRAINT_WEIGHTS = {
+    'teacher_day_off': 10,
+}
+# Budget for the optional soft-constraint pass that follows the feasibility solve
+SOFT_CONSTRAINT_MAX_SECONDS = 10
+SOFT_CONSTRAINT_GAP_LIMIT = 0.1
 
 # Configure page
 st.set_page_config(
@@ -16,8 +48,8 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Custom CSS for better styling
-st.markdown("""
+# Custom CSS for better styling (emitted at the top of every run by main())
+_CSS_HTML = """
 <style>
     .main-header {
         background: linear-gradient(90deg, #667eea 0%, #764ba2 100%);
@@ -108,7 +140,55 @@ st.markdown("""
         font-weight: bold;
     }
 </style>
-""", unsafe_allow_html=True)
+"""
+
+# Static banners, passed to st.markdown as-is
+_HEADER_HTML = """
+<div class="main-header">
+    <h1>🎓 Enhanced College Timetable Generator</h1>
+    <p>Multi-Year • Multi-Section • SQLite Database • Advanced Analytics</p>
+</div>
+"""
+
+_SQLITE_FEATURE_HTML = """
+<div class="sqlite-feature">
+    🗄️ <strong>New SQLite Features:</strong> Database Export • Advanced Queries • Conflict Analysis • Performance Views
+</div>
+"""
+
+_SECTION_FEATURE_HTML = """
+<div class="enhanced-feature">
+    📚 <strong>Section Management:</strong> Multiple Sections per Year • Room Assignment • Capacity Management • Section-wise Scheduling
+</div>
+"""
+
+_SECTION_HEADER_HTML = """
+<div class="section-header">
+    📋 Section Management System
+</div>
+"""
+
+_DB_FEATURE_HTML = """
+<div class="sqlite-feature">
+    🎯 <strong>Database Features:</strong> Complete timetable data • Advanced queries • Performance analytics • Export capabilities
+</div>
+"""
+
+
+def _year_box_html(year: str) -> str:
+    return f'<div class="year-box"><h4>📘 {year}</h4></div>'
+
+
+def _section_box_html(section_name: str) -> str:
+    return f'<div class="section-box"><h5>📚 Section {section_name}</h5></div>'
+
+
+def _teacher_card_html(name: str, department: str, start_hr: int, end_hr: int, years: List[str]) -> str:
+    return (
+        f'<div class="constraint-box"><strong>{name}</strong> - {department}<br>'
+        f'Available: {start_hr}:00 - {end_hr}:00<br>'
+        f'Teaching Years: {", ".join(years)}</div>'
+    )
 
 
 def initialize_session_state():
@@ -127,260 +207,565 @@ def initialize_session_state():
         st.session_state.sqlite_db_path = None
     if 'last_error' not in st.session_state:
         st.session_state.last_error = None
+    # Columnar copies of teachers/sections for filtering and display; the dicts stay
+    # the source of truth for the solver and database, so every edit refreshes both
+    if 'teachers_df' not in st.session_state:
+        refresh_teachers_df()
+    if 'sections_df' not in st.session_state:
+        refresh_sections_df()
+    if 'display_df' not in st.session_state:
+        refresh_timetable_df()
+
+
+def refresh_teachers_df():
+    """Rebuild st.session_state.teachers_df and the year -> teacher names index from the teachers dict."""
+    teachers_df = pd.DataFrame(
+        [(name, info['department'], info['start_hr'], info['end_hr'], frozenset(info['years']))
+         for name, info in st.session_state.teachers.items()],
+        columns=['name', 'department', 'start_hr', 'end_hr', 'years']
+    )
+    st.session_state.teachers_df = teachers_df
+    st.session_state.teachers_by_year = (
+        teachers_df.explode('years').groupby('years', sort=False)['name'].agg(list).to_dict()
+    )
 
 
-def create_sqlite_database(timetable_data, teachers, sections, courses):
-    """Create SQLite database with timetable data"""
+def refresh_sections_df():
+    """Rebuild st.session_state.sections_df (one row per year/section) and the year -> section names index."""
+    sections_df = pd.DataFrame(
+        [(year, section, info['capacity'], info['room'], info.get('created_at', 'N/A'))
+         for year, year_sections in st.session_state.sections.items()
+         for section, info in year_sections.items()],
+        columns=['year', 'section', 'capacity', 'room', 'created_at']
+    )
+    st.session_state.sections_df = sections_df
+    st.session_state.sections_by_year = sections_df.groupby('year', sort=False)['section'].agg(list).to_dict()
+
+
+TIMETABLE_COLUMNS = ['year', 'section', 'day', 'slot', 'subject', 'teacher', 'room', 'start_time', 'end_time', 'is_free', 'is_lunch']
+CATEGORY_COLUMNS = ('year', 'section', 'day', 'subject', 'teacher', 'room')
+
+
+def timetable_to_long_df(timetable) -> pd.DataFrame:
+    """Flatten year -> section -> day -> items into one row per timetable entry.
+
+    This is the only pass over the nested timetable; View Results, the
+    section comparison, CSV export and the SQLite load all slice this frame.
+    """
+    df = pd.DataFrame.from_records(
+        ((year, section, day, item['slot'], item['subject'], item['teacher'], item.get('room', ''),
+          item['start_time'], item['end_time'], item['is_free'])
+         for year, year_data in (timetable or {}).items()
+         for section, section_data in year_data.items()
+         for day, schedule in section_data.items()
+         for item in schedule),
+        columns=TIMETABLE_COLUMNS[:-1]
+    )
+    df['is_free'] = df['is_free'].astype(bool)
+    df['is_lunch'] = df['start_time'].astype(str).str.startswith('12:')
+    # Few distinct values per column: integer category codes are smaller and group faster than strings
+    for column in CATEGORY_COLUMNS:
+        df[column] = df[column].astype('category')
+    return df
+
+
+DISPLAY_COLUMNS = ['Time', 'Subject', 'Teacher', 'Room', 'Slot']
+
+
+def timetable_display_df(timetable_df: pd.DataFrame) -> pd.DataFrame:
+    """View Results table for every entry: year/section/day keys plus DISPLAY_COLUMNS."""
+    is_free = timetable_df['is_free'].to_numpy(dtype=bool)
+    is_lunch = timetable_df['is_lunch'].to_numpy(dtype=bool)
+    subject = timetable_df['subject'].to_numpy(dtype=object)
+    return pd.DataFrame({
+        'year': timetable_df['year'],
+        'section': timetable_df['section'],
+        'day': timetable_df['day'],
+        'Time': timetable_df['start_time'] + ' - ' + timetable_df['end_time'],
+        'Subject': np.where(is_free, '🆓 Free Period', np.where(is_lunch, '🍽️ ' + subject, subject)),
+        'Teacher': np.where(is_free, '—', timetable_df['teacher'].to_numpy(dtype=object)),
+        'Room': timetable_df['room'],
+        'Slot': timetable_df['slot']
+    })
+
+
+def refresh_timetable_df():
+    """Rebuild st.session_state.timetable_df (long format) and display_df from the generated timetable."""
+    st.session_state.timetable_df = timetable_to_long_df(st.session_state.generated_timetable)
+    st.session_state.display_df = timetable_display_df(st.session_state.timetable_df)
+
+
+COURSE_COLUMNS = ['subject', 'subject_code', 'year', 'section', 'teacher', 'lectures', 'duration']
+
+
+def parse_course_rows(rows: pd.DataFrame, teachers_df: pd.DataFrame, sections_df: pd.DataFrame) -> Tuple[List[Dict[str, Any]], int]:
+    """Validate bulk-entered course rows in one vectorized pass.
+
+    A row is kept when it has a subject, names an existing year/section, its
+    teacher teaches that year, and lectures/duration are in the form's ranges.
+    Returns (course records, number of rejected rows).
+    """
+    rows = rows.dropna(how='all')
+    subject = rows['subject'].fillna('').astype(str).str.strip()
+    code = rows['subject_code'].fillna('').astype(str).str.strip()
+    year = rows['year'].fillna('').astype(str)
+    section = rows['section'].fillna('').astype(str).str.strip().str.upper()
+    teacher = rows['teacher'].fillna('').astype(str)
+    lectures = pd.to_numeric(rows['lectures'], errors='coerce')
+    duration = pd.to_numeric(rows['duration'], errors='coerce')
+
+    teacher_years = teachers_df.explode('years')
+    known_section = pd.MultiIndex.from_arrays([year, section]).isin(
+        pd.MultiIndex.from_arrays([sections_df['year'], sections_df['section']]))
+    known_teacher = pd.MultiIndex.from_arrays([teacher, year]).isin(
+        pd.MultiIndex.from_arrays([teacher_years['name'], teacher_years['years']]))
+    valid = subject.ne('') & known_section & known_teacher & lectures.between(1, 8) & duration.isin([1, 2, 3])
+
+    courses = pd.DataFrame({
+        'subject': subject,
+        'subject_code': code.where(code.ne(''), subject.str[:6].str.upper()),
+        'year': year,
+        'section': section,
+        'teacher': teacher,
+        'lectures': lectures,
+        'duration': duration
+    })[valid].astype({'lectures': int, 'duration': int})
+    return courses.to_dict('records'), int((~valid).sum())
+
+
+def add_courses_batch(records: List[Dict[str, Any]]):
+    """Append course records to the session in one step (one rerun for any number of rows)."""
+    st.session_state.courses.extend(records)
+
+
+# Form submit callbacks. They run before the rerun that follows a submit, so the
+# page renders once with the new data; messages are shown by show_form_notice.
+def _set_form_notice(kind: str, message: str):
+    st.session_state.form_notice = (kind, message)
+
+
+def show_form_notice():
+    """Show (and drop) the message left by the last form callback."""
+    notice = st.session_state.pop('form_notice', None)
+    if notice:
+        kind, message = notice
+        getattr(st, kind)(message)
+
+
+def add_teacher_submit():
+    state = st.session_state
+    teacher_name = state.teacher_name
+    if not teacher_name:
+        _set_form_notice('error', "❌ Please enter teacher name.")
+        return
+    state.teachers[teacher_name] = {
+        "name": teacher_name,
+        "department": state.teacher_department,
+        "start_hr": state.teacher_start_hr,
+        "end_hr": state.teacher_end_hr,
+        "years": state.teacher_years
+    }
+    refresh_teachers_df()
+    _set_form_notice('success', f"✅ Teacher '{teacher_name}' added successfully!")
+
+
+def add_section_submit():
+    state = st.session_state
+    year, section_name = state.section_year, state.section_name
+    if not (year and section_name):
+        _set_form_notice('error', "❌ Please fill in year and section name.")
+        return
+    state.sections.setdefault(year, {})[section_name.upper()] = {
+        "capacity": state.section_capacity,
+        "room": state.section_room,
+        "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    }
+    refresh_sections_df()
+    _set_form_notice('success', f"✅ Section '{section_name.upper()}' added to {year}!")
+
+
+def add_course_submit():
+    state = st.session_state
+    subject_name, year, teacher = state.course_subject, state.course_year, state.get('course_teacher')
+    # The section widget is a selectbox when the year has sections, otherwise free text
+    section = state.course_section if state.sections_by_year.get(year) else state.get('course_section_text')
+    if not (subject_name and teacher and section):
+        _set_form_notice('error', "❌ Please fill in all required fields.")
+        return
+    add_courses_batch([{
+        "subject": subject_name.strip(),
+        "subject_code": state.course_code.strip() or subject_name[:6].upper(),
+        "year": year,
+        "section": section,
+        "teacher": teacher,
+        "lectures": int(state.course_lectures),
+        "duration": int(state.course_duration)
+    }])
+    _set_form_notice('success', f"✅ Course '{subject_name}' for {year}-{section} added successfully!")
+
+
+def _stable_digest(value) -> str:
+    """Content hash used as a cache key, stable across reruns for equal data."""
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode()).hexdigest()
+
+
+# Database schema, run in one executescript call when a database is built
+_SCHEMA_SQL = """
+BEGIN;
+
+CREATE TABLE teachers (
+    teacher_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL UNIQUE,
+    department TEXT,
+    start_hour INTEGER,
+    end_hour INTEGER,
+    years_teaching TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE sections (
+    section_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    year TEXT NOT NULL,
+    section_name TEXT NOT NULL,
+    capacity INTEGER,
+    room_number TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE(year, section_name)
+);
+
+CREATE TABLE subjects (
+    subject_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL UNIQUE,
+    code TEXT,
+    credits INTEGER DEFAULT 3,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE courses (
+    course_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    subject_id INTEGER,
+    teacher_id INTEGER,
+    section_id INTEGER,
+    lectures_per_week INTEGER,
+    duration_hours INTEGER,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (subject_id) REFERENCES subjects (subject_id),
+    FOREIGN KEY (teacher_id) REFERENCES teachers (teacher_id),
+    FOREIGN KEY (section_id) REFERENCES sections (section_id)
+);
+
+CREATE TABLE timetable (
+    timetable_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    course_id INTEGER,
+    year TEXT NOT NULL,
+    section_name TEXT,
+    day_of_week TEXT NOT NULL,
+    start_time TEXT NOT NULL,
+    end_time TEXT NOT NULL,
+    slot_name TEXT,
+    subject_name TEXT,
+    teacher_name TEXT,
+    room_number TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (course_id) REFERENCES courses (course_id)
+);
+
+CREATE TABLE time_slots (
+    slot_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    slot_name TEXT UNIQUE NOT NULL,
+    day_of_week TEXT NOT NULL,
+    start_time TEXT NOT NULL,
+    end_time TEXT NOT NULL,
+    is_lunch_period BOOLEAN DEFAULT 0
+);
+
+COMMIT;
+"""
+
+# Indexes and views, created in a second script after the bulk data load
+_POST_LOAD_SQL = """
+BEGIN;
+
+-- Indexes for better performance
+CREATE INDEX idx_timetable_year_day ON timetable(year, day_of_week);
+CREATE INDEX idx_timetable_teacher_slot ON timetable(teacher_name, day_of_week, start_time);
+CREATE INDEX idx_timetable_subject ON timetable(subject_name);
+CREATE INDEX idx_timetable_room ON timetable(room_number);
+CREATE INDEX idx_courses_teacher ON courses(teacher_id);
+CREATE INDEX idx_courses_section ON courses(section_id);
+
+-- Views for common queries
+CREATE VIEW teacher_schedule AS
+SELECT 
+    t.year,
+    t.section_name,
+    t.day_of_week,
+    t.start_time,
+    t.end_time,
+    t.subject_name,
+    t.teacher_name,
+    teach.department,
+    s.capacity as section_capacity,
+    s.room_number
+FROM timetable t
+LEFT JOIN courses c ON t.course_id = c.course_id
+LEFT JOIN teachers teach ON c.teacher_id = teach.teacher_id
+LEFT JOIN sections s ON c.section_id = s.section_id
+WHERE t.subject_name != 'Free'
+ORDER BY t.year, t.section_name, t.day_of_week, t.start_time;
+
+-- Summary tables, materialized once per build (the database is rebuilt
+-- wholesale whenever the timetable changes, so they never go stale)
+CREATE TABLE section_schedule AS
+SELECT 
+    t.year,
+    t.section_name,
+    t.day_of_week,
+    t.start_time,
+    t.end_time,
+    t.subject_name,
+    t.teacher_name,
+    COUNT(*) OVER (PARTITION BY t.year, t.section_name, t.day_of_week) as classes_per_day
+FROM timetable t
+ORDER BY t.year, t.section_name, t.day_of_week, t.start_time;
+
+CREATE INDEX idx_ss_year_section ON section_schedule(year, section_name);
+
+CREATE TABLE teacher_workload AS
+SELECT 
+    teach.name as teacher_name,
+    teach.department,
+    COUNT(DISTINCT t.year) as years_teaching_count,
+    COUNT(t.timetable_id) as total_classes_per_week,
+    GROUP_CONCAT(DISTINCT t.year) as years_list,
+    GROUP_CONCAT(DISTINCT t.subject_name) as subjects_taught
+FROM teachers teach
+LEFT JOIN courses c ON teach.teacher_id = c.teacher_id
+LEFT JOIN timetable t ON c.course_id = t.course_id
+WHERE t.subject_name != 'Free'
+GROUP BY teach.teacher_id, teach.name, teach.department
+ORDER BY total_classes_per_week DESC;
+
+CREATE INDEX idx_tw_name ON teacher_workload(teacher_name);
+
+COMMIT;
+"""
+
+
+def remove_sqlite_database(db_path):
+    """Close the session's connection to a database build and delete its files."""
+    try:
+        get_db_conn.clear(db_path)
+    except StreamlitAPIException:
+        pass  # session is ending (no script run); its connection cache is released with it
+    for leftover in (db_path, f"{db_path}-wal", f"{db_path}-shm"):
+        try:
+            os.remove(leftover)
+        except OSError:
+            pass
+
+
+@st.cache_resource(show_spinner=False, max_entries=1, scope="session",
+                   on_release=remove_sqlite_database, hash_funcs={dict: _stable_digest})
+def create_sqlite_database(timetable_df, teachers, sections, courses):
+    """Create SQLite database from the long-format timetable (see timetable_to_long_df).
+
+    Cached per session on the content of the inputs: identical inputs reuse the
+    existing database file instead of rebuilding. Each session keeps only its
+    latest build; the file is deleted when a new build replaces it, when the
+    cache is cleared, or when the session ends.
+    Returns the database path; queries go through get_db_conn.
+    """
     # Create temporary database file
     temp_db = tempfile.NamedTemporaryFile(delete=False, suffix='.db')
     temp_db.close()
     
     conn = sqlite3.connect(temp_db.name)
-    cursor = conn.cursor()
-    
-    # Create tables
-    cursor.execute('''
-    CREATE TABLE teachers (
-        teacher_id INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT NOT NULL UNIQUE,
-        department TEXT,
-        start_hour INTEGER,
-        end_hour INTEGER,
-        years_teaching TEXT,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )
-    ''')
-    
-    cursor.execute('''
-    CREATE TABLE sections (
-        section_id INTEGER PRIMARY KEY AUTOINCREMENT,
-        year TEXT NOT NULL,
-        section_name TEXT NOT NULL,
-        capacity INTEGER,
-        room_number TEXT,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        UNIQUE(year, section_name)
-    )
-    ''')
-    
-    cursor.execute('''
-    CREATE TABLE subjects (
-        subject_id INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT NOT NULL,
-        code TEXT,
-        credits INTEGER DEFAULT 3,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )
-    ''')
-    
-    cursor.execute('''
-    CREATE TABLE courses (
-        course_id INTEGER PRIMARY KEY AUTOINCREMENT,
-        subject_id INTEGER,
-        teacher_id INTEGER,
-        section_id INTEGER,
-        lectures_per_week INTEGER,
-        duration_hours INTEGER,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY (subject_id) REFERENCES subjects (subject_id),
-        FOREIGN KEY (teacher_id) REFERENCES teachers (teacher_id),
-        FOREIGN KEY (section_id) REFERENCES sections (section_id)
-    )
-    ''')
-    
-    cursor.execute('''
-    CREATE TABLE timetable (
-        timetable_id INTEGER PRIMARY KEY AUTOINCREMENT,
-        course_id INTEGER,
-        year TEXT NOT NULL,
-        section_name TEXT,
-        day_of_week TEXT NOT NULL,
-        start_time TEXT NOT NULL,
-        end_time TEXT NOT NULL,
-        slot_name TEXT,
-        subject_name TEXT,
-        teacher_name TEXT,
-        room_number TEXT,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY (course_id) REFERENCES courses (course_id)
-    )
-    ''')
+    # Tune for a one-shot bulk build before any statement opens a transaction.
+    # The file is rebuilt from session data on any failure, so the load skips fsyncs.
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=OFF')
+    conn.execute('PRAGMA cache_size=-20000')
+    conn.execute('PRAGMA temp_store=MEMORY')
     
-    cursor.execute('''
-    CREATE TABLE time_slots (
-        slot_id INTEGER PRIMARY KEY AUTOINCREMENT,
-        slot_name TEXT UNIQUE NOT NULL,
-        day_of_week TEXT NOT NULL,
-        start_time TEXT NOT NULL,
-        end_time TEXT NOT NULL,
-        is_lunch_period BOOLEAN DEFAULT 0
-    )
-    ''')
+    conn.executescript(_SCHEMA_SQL)
     
-    # Insert teachers
-    teacher_id_map = {}
-    for teacher_name, teacher_info in teachers.items():
-        cursor.execute('''
+    # One transaction for the data load
+    with conn:
+        conn.execute('BEGIN')
+        cursor = conn.cursor()
+        
+        # Insert teachers
+        teacher_rows = [
+            (
+                teacher_name,
+                teacher_info.get('department', ''),
+                teacher_info.get('start_hr', 9),
+                teacher_info.get('end_hr', 17),
+                ','.join(teacher_info.get('years', []))
+            )
+            for teacher_name, teacher_info in teachers.items()
+        ]
+        cursor.executemany('''
         INSERT INTO teachers (name, department, start_hour, end_hour, years_teaching)
         VALUES (?, ?, ?, ?, ?)
-        ''', (
-            teacher_name,
-            teacher_info.get('department', ''),
-            teacher_info.get('start_hr', 9),
-            teacher_info.get('end_hr', 17),
-            ','.join(teacher_info.get('years', []))
-        ))
-        teacher_id_map[teacher_name] = cursor.lastrowid
-    
-    # Insert sections
-    section_id_map = {}
-    for year, year_sections in sections.items():
-        for section_name, section_info in year_sections.items():
-            cursor.execute('''
-            INSERT INTO sections (year, section_name, capacity, room_number)
-            VALUES (?, ?, ?, ?)
-            ''', (
+        ''', teacher_rows)
+        teacher_id_map = dict(cursor.execute('SELECT name, teacher_id FROM teachers').fetchall())
+        
+        # Insert sections
+        section_rows = [
+            (
                 year,
                 section_name,
                 section_info.get('capacity', 60),
                 section_info.get('room', '')
-            ))
-            section_id_map[f"{year}_{section_name}"] = cursor.lastrowid
-    
-    # Insert subjects and courses
-    subject_id_map = {}
-    course_id_map = {}
-    
-    for course in courses:
-        subject_name = course['subject']
-        
-        # Insert subject if not exists
-        if subject_name not in subject_id_map:
-            cursor.execute('''
-            INSERT OR IGNORE INTO subjects (name, code)
-            VALUES (?, ?)
-            ''', (subject_name, subject_name[:6].upper()))
-            
-            cursor.execute('SELECT subject_id FROM subjects WHERE name = ?', (subject_name,))
-            subject_id_map[subject_name] = cursor.fetchone()[0]
+            )
+            for year, year_sections in sections.items()
+            for section_name, section_info in year_sections.items()
+        ]
+        cursor.executemany('''
+        INSERT INTO sections (year, section_name, capacity, room_number)
+        VALUES (?, ?, ?, ?)
+        ''', section_rows)
+        section_id_map = {
+            f"{year}_{section_name}": section_id
+            for year, section_name, section_id in cursor.execute('SELECT year, section_name, section_id FROM sections')
+        }
         
-        # Insert course
-        teacher_id = teacher_id_map.get(course['teacher'])
-        subject_id = subject_id_map[subject_name]
-        section_key = f"{course['year']}_{course.get('section', 'A')}"
-        section_id = section_id_map.get(section_key)
+        # Insert subjects and courses; subjects.name is UNIQUE so repeats are ignored by SQLite
+        unique_subjects = dict.fromkeys(course['subject'] for course in courses)  # ordered set
+        cursor.executemany('''
+        INSERT OR IGNORE INTO subjects (name, code)
+        VALUES (?, ?)
+        ''', [(subject_name, subject_name[:6].upper()) for subject_name in unique_subjects])
+        subject_id_map = dict(cursor.execute('SELECT name, subject_id FROM subjects').fetchall())
         
-        cursor.execute('''
+        course_rows = [
+            (
+                subject_id_map[course['subject']],
+                teacher_id_map.get(course['teacher']),
+                section_id_map.get(f"{course['year']}_{course.get('section', 'A')}"),
+                course['lectures'],
+                course['duration']
+            )
+            for course in courses
+        ]
+        cursor.executemany('''
         INSERT INTO courses (subject_id, teacher_id, section_id, lectures_per_week, duration_hours)
         VALUES (?, ?, ?, ?, ?)
-        ''', (
-            subject_id,
-            teacher_id,
-            section_id,
-            course['lectures'],
-            course['duration']
+        ''', course_rows)
+        
+        # Fresh table inside one transaction, so ids follow insertion order
+        cursor.execute('SELECT course_id FROM courses ORDER BY course_id')
+        course_id_map = {
+            f"{course['subject']}_{course['year']}_{course.get('section', 'A')}_{course['teacher']}": course_id
+            for course, (course_id,) in zip(courses, cursor.fetchall())
+        }
+        
+        # Insert timetable data
+        course_keys = (timetable_df['subject'].astype(str) + '_' + timetable_df['year'].astype(str) + '_'
+                       + timetable_df['section'].astype(str) + '_' + timetable_df['teacher'].astype(str))
+        timetable_rows = list(zip(
+            [course_id_map.get(key) for key in course_keys],
+            timetable_df['year'],
+            timetable_df['section'],
+            timetable_df['day'].str.capitalize(),
+            timetable_df['start_time'],
+            timetable_df['end_time'],
+            timetable_df['slot'],
+            timetable_df['subject'],
+            timetable_df['teacher'],
+            timetable_df['room']
         ))
+        cursor.executemany('''
+        INSERT INTO timetable (
+            course_id, year, section_name, day_of_week, start_time, end_time,
+            slot_name, subject_name, teacher_name, room_number
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', timetable_rows)
         
-        course_key = f"{course['subject']}_{course['year']}_{course['teacher']}"
-        course_id_map[course_key] = cursor.lastrowid
-    
-    # Insert timetable data
-    for year, year_data in timetable_data.items():
-        for day, day_schedule in year_data.items():
-            for item in day_schedule:
-                course_key = f"{item['subject']}_{year}_{item['teacher']}"
-                course_id = course_id_map.get(course_key)
-                
-                # Determine section (default to 'A' if not specified)
-                section_name = item.get('section', 'A')
-                
-                cursor.execute('''
-                INSERT INTO timetable (
-                    course_id, year, section_name, day_of_week, start_time, end_time,
-                    slot_name, subject_name, teacher_name, room_number
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    course_id,
-                    year,
-                    section_name,
-                    day.capitalize(),
-                    item['start_time'],
-                    item['end_time'],
-                    item['slot'],
-                    item['subject'],
-                    item['teacher'],
-                    item.get('room', '')
-                ))
+    conn.executescript(_POST_LOAD_SQL)
     
-    # Create indexes for better performance
-    cursor.execute('CREATE INDEX idx_timetable_year_day ON timetable(year, day_of_week)')
-    cursor.execute('CREATE INDEX idx_timetable_teacher ON timetable(teacher_name)')
-    cursor.execute('CREATE INDEX idx_timetable_subject ON timetable(subject_name)')
-    cursor.execute('CREATE INDEX idx_courses_teacher ON courses(teacher_id)')
-    cursor.execute('CREATE INDEX idx_courses_section ON courses(section_id)')
-    
-    # Create views for common queries
-    cursor.execute('''
-    CREATE VIEW teacher_schedule AS
-    SELECT 
-        t.year,
-        t.section_name,
-        t.day_of_week,
-        t.start_time,
-        t.end_time,
-        t.subject_name,
-        t.teacher_name,
-        teach.department,
-        s.capacity as section_capacity,
-        s.room_number
-    FROM timetable t
-    LEFT JOIN courses c ON t.course_id = c.course_id
-    LEFT JOIN teachers teach ON c.teacher_id = teach.teacher_id
-    LEFT JOIN sections s ON c.section_id = s.section_id
-    WHERE t.subject_name != 'Free'
-    ORDER BY t.year, t.section_name, t.day_of_week, t.start_time
-    ''')
-    
-    cursor.execute('''
-    CREATE VIEW section_schedule AS
-    SELECT 
-        t.year,
-        t.section_name,
-        t.day_of_week,
-        t.start_time,
-        t.end_time,
-        t.subject_name,
-        t.teacher_name,
-        COUNT(*) OVER (PARTITION BY t.year, t.section_name, t.day_of_week) as classes_per_day
-    FROM timetable t
-    ORDER BY t.year, t.section_name, t.day_of_week, t.start_time
-    ''')
-    
-    cursor.execute('''
-    CREATE VIEW teacher_workload AS
-    SELECT 
-        teach.name as teacher_name,
-        teach.department,
-        COUNT(DISTINCT t.year) as years_teaching_count,
-        COUNT(t.timetable_id) as total_classes_per_week,
-        GROUP_CONCAT(DISTINCT t.year) as years_list,
-        GROUP_CONCAT(DISTINCT t.subject_name) as subjects_taught
-    FROM teachers teach
-    LEFT JOIN courses c ON teach.teacher_id = c.teacher_id
-    LEFT JOIN timetable t ON c.course_id = t.course_id
-    WHERE t.subject_name != 'Free'
-    GROUP BY teach.teacher_id, teach.name, teach.department
-    ORDER BY total_classes_per_week DESC
-    ''')
-    
-    conn.commit()
+    # Fold the WAL back into the main file so the .db on disk is complete for download,
+    # and leave rollback-journal mode so read-only connections need no -shm file
+    conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    conn.execute('PRAGMA journal_mode=DELETE')
     conn.close()
     
     return temp_db.name
 
 
+@st.cache_resource(show_spinner=False, max_entries=1, scope="session", on_release=sqlite3.Connection.close)
+def get_db_conn(db_path: str) -> sqlite3.Connection:
+    """Long-lived read-only connection to a built database, shared across reruns.
+
+    Scoped to the session like create_sqlite_database, so another session can
+    never evict it mid-query. Closed when the session's database is replaced
+    or removed, or when the session ends. Pages are memory-mapped and kept in a
+    larger page cache, so repeated queries don't go back through read() calls.
+    """
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, check_same_thread=False)
+    conn.execute('PRAGMA query_only=1')
+    conn.execute('PRAGMA mmap_size=268435456')
+    conn.execute('PRAGMA cache_size=-65536')
+    return conn
+
+
+SQL_CHUNK_ROWS = 5000           # rows fetched per read when a query has a row cap
+CUSTOM_QUERY_MAX_ROWS = 10000   # default row cap for custom queries
+# Arrow-backed result columns (compact strings, faster groupby) when pyarrow is installed
+SQL_READ_OPTIONS = {'dtype_backend': 'pyarrow'} if pyarrow is not None else {}
+
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def run_sql_query(db_path: str, sql: str, mtime: float, max_rows: int = None) -> pd.DataFrame:
+    """Result of a query against a built database, cached per file version (mtime).
+
+    With max_rows the result is fetched in chunks and reading stops once
+    max_rows + 1 rows are in, so an unbounded custom query can't load a whole
+    table. The extra row only signals that the result was cut at max_rows;
+    callers drop it before display or export.
+    """
+    conn = get_db_conn(db_path)
+    if max_rows is None:
+        return pd.read_sql_query(sql, conn, **SQL_READ_OPTIONS)
+    limit = max_rows + 1
+    chunks = []
+    fetched = 0
+    for chunk in pd.read_sql_query(sql, conn, chunksize=min(limit, SQL_CHUNK_ROWS), **SQL_READ_OPTIONS):
+        chunks.append(chunk)
+        fetched += len(chunk)
+        if fetched >= limit:
+            break
+    return pd.concat(chunks, ignore_index=True).head(limit) if chunks else pd.DataFrame()
+
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def query_csv_bytes(db_path: str, sql: str, mtime: float, max_rows: int = None) -> bytes:
+    """CSV export of a query result, cached like run_sql_query so reruns reuse the bytes."""
+    df = run_sql_query(db_path, sql, mtime, max_rows)
+    if max_rows is not None:
+        df = df.head(max_rows)
+    return df.to_csv(index=False).encode()
+
+
+# Display names for the pre-built queries, in selectbox order
+QUERY_NAMES = {
+    "complete_timetable": "📋 Complete Timetable",
+    "teacher_conflicts": "⚠️ Teacher Conflicts",
+    "section_utilization": "📊 Section Utilization",
+    "daily_schedule_summary": "📅 Daily Schedule Summary",
+    "teacher_schedule": "👨‍🏫 Teacher Schedules",
+    "workload_analysis": "💼 Workload Analysis",
+    "teacher_utilization": "👩‍🏫 Teacher Utilization",
+    "subject_distribution": "📚 Subject Distribution",
+    "room_utilization": "🏛️ Room Utilization"
+}
+
+
+@functools.lru_cache(maxsize=1)
 def generate_sql_export_queries():
-    """Generate comprehensive SQL queries for data export and analysis"""
+    """Generate comprehensive SQL queries for data export and analysis (built once per process)"""
     return {
         "complete_timetable": """
 -- Complete Timetable with All Details
@@ -529,14 +914,81 @@ LEFT JOIN courses c ON teach.teacher_id = c.teacher_id
 LEFT JOIN timetable t ON c.course_id = t.course_id
 GROUP BY teach.teacher_id, teach.name, teach.department, teach.start_hour, teach.end_hour
 ORDER BY total_classes_per_week DESC;
+""",
+
+        "teacher_utilization": """
+-- Classes per Teacher (same figures as the Analytics tab)
+SELECT 
+    teacher_name,
+    COUNT(*) as classes_per_week,
+    COUNT(DISTINCT year) as years_teaching,
+    COUNT(DISTINCT year || '-' || section_name) as sections
+FROM timetable
+WHERE subject_name != 'Free' AND teacher_name != 'None'
+GROUP BY teacher_name
+ORDER BY classes_per_week DESC;
+""",
+
+        "subject_distribution": """
+-- Classes per Subject
+SELECT 
+    subject_name,
+    COUNT(*) as total_classes,
+    COUNT(DISTINCT year) as years_offered,
+    COUNT(DISTINCT NULLIF(teacher_name, 'None')) as teachers,
+    GROUP_CONCAT(DISTINCT year) as years_list
+FROM timetable
+WHERE subject_name != 'Free'
+GROUP BY subject_name
+ORDER BY total_classes DESC;
+""",
+
+        "room_utilization": """
+-- Room Usage
+SELECT 
+    room_number,
+    COUNT(CASE WHEN subject_name != 'Free' THEN 1 END) as classes_per_week,
+    COUNT(DISTINCT year || '-' || section_name) as sections_using,
+    COUNT(DISTINCT CASE WHEN subject_name != 'Free' THEN subject_name END) as different_subjects
+FROM timetable
+GROUP BY room_number
+ORDER BY classes_per_week DESC;
 """
     }
 
 
+@functools.lru_cache(maxsize=8)
+def _allowed_starts_for_layout(slot_time_key: Tuple[int, ...], slot_day_key: Tuple[int, ...]):
+    """Allowed-start lookup specialised to one slot layout (start hour and day code per slot).
+
+    The layout only changes when working days are edited, so the returned
+    function and its per-(duration, start_hr, end_hr) cache survive across solves.
+    """
+    slot_time_arr = np.array(slot_time_key, dtype=np.int32)
+    slot_day_arr = np.array(slot_day_key, dtype=np.int32)
+    num_slots = len(slot_time_key)
+
+    @functools.lru_cache(maxsize=None)
+    def compute_allowed(dur: int, sh: int, eh: int) -> Tuple[Tuple[int, ...], Any]:
+        """Start slots where `dur` consecutive slots stay on one day inside [sh, eh)."""
+        n_starts = num_slots - dur + 1
+        if n_starts <= 0:
+            return (), None
+        ok = allowed_start_mask(slot_time_arr, slot_day_arr, dur, sh, eh)
+        allowed = tuple(np.flatnonzero(ok).tolist())
+        if not allowed:
+            return allowed, None
+        # Allowed starts form one contiguous run per day; hand CP-SAT the runs, not every value
+        edges = np.flatnonzero(np.diff(np.concatenate(([0], ok.view(np.int8), [0]))))
+        runs = [[int(lo), int(hi) - 1] for lo, hi in zip(edges[::2], edges[1::2])]
+        return allowed, cp_model.Domain.FromIntervals(runs)
+
+    return compute_allowed
+
+
 def get_time_slots(slot_dict: Dict[str, int], start_times: Dict[str, int]) -> Tuple[List[str], Dict[int,int], Dict[str,str], Dict[str,int]]:
     """Generate time slots based on working days and hours."""
     slot_names: List[str] = []
-    slot_time: Dict[int,int] = {}
     slot_to_day: Dict[str,str] = {}
     day_slot_counts: Dict[str,int] = {}
 
@@ -545,104 +997,157 @@ def get_time_slots(slot_dict: Dict[str, int], start_times: Dict[str, int]) -> Tu
         'Thursday': 'Th', 'Friday': 'F', 'Saturday': 'Sa', 'Sunday': 'Su'
     }
 
-    idx = 0
-    for day, hours in slot_dict.items():
-        hours = int(hours)
-        start = int(start_times[day])
-        abbrev = day_abbreviations.get(day, day[:2])
-        day_count = 0
+    days = list(slot_dict)
+    day_hours = np.array([int(slot_dict[day]) for day in days], dtype=np.int32)
+    day_starts = np.array([int(start_times[day]) for day in days], dtype=np.int32)
+    slot_time: Dict[int,int] = dict(enumerate(slot_start_hours(day_hours, day_starts).tolist()))
 
+    for day, hours in zip(days, day_hours.tolist()):
+        abbrev = day_abbreviations.get(day, day[:2])
         for j in range(hours):
-            # Skip lunch hour if it would fall here
-            while start == 12:
-                start += 1
             slot_name = f"{abbrev}{j + 1}"
             slot_names.append(slot_name)
-            slot_time[idx] = start
             slot_to_day[slot_name] = day.lower()
-            day_count += 1
-            idx += 1
-            start += 1
 
-        day_slot_counts[day.lower()] = day_count
+        day_slot_counts[day.lower()] = hours
 
     return slot_names, slot_time, slot_to_day, day_slot_counts
 
 
-def apply_teacher_conflict_constraint(model, occ_metadata, start_at, slot_names, teachers_dict):
+def apply_teacher_conflict_constraint(model, occ_metadata, teachers_dict):
     """Apply teacher conflict constraint: A teacher cannot teach multiple classes at the same time."""
-    teacher_occurrences = {}
+    teacher_intervals: Dict[str, List[cp_model.IntervalVar]] = defaultdict(list)
     for occ in occ_metadata:
         teacher = occ.get('teacher', 'Unknown')
-        if teacher not in teacher_occurrences:
-            teacher_occurrences[teacher] = []
-        teacher_occurrences[teacher].append(occ)
-    
-    for teacher, occurrences in teacher_occurrences.items():
-        if len(occurrences) <= 1:
+        # Free periods all carry the placeholder teacher 'None'; they are not a real person
+        if teacher == 'None':
             continue
-            
-        for i in range(len(occurrences)):
-            for j in range(i + 1, len(occurrences)):
-                occ1 = occurrences[i]
-                occ2 = occurrences[j]
-                dur1 = occ1['duration']
-                dur2 = occ2['duration']
-                
-                for s1 in range(len(slot_names)):
-                    if (occ1['occ_id'], s1) not in start_at:
-                        continue
-                    
-                    for s2 in range(len(slot_names)):
-                        if (occ2['occ_id'], s2) not in start_at:
-                            continue
-                        
-                        end1 = s1 + dur1
-                        end2 = s2 + dur2
-                        
-                        if not (end1 <= s2 or end2 <= s1):
-                            model.Add(start_at[(occ1['occ_id'], s1)] + start_at[(occ2['occ_id'], s2)] <= 1)
-
-
-def apply_section_constraint(model, occ_metadata, start_at, slot_names):
-    """Apply section constraint: Only one class per section at any time."""
-    section_occurrences = {}
-    for occ in occ_metadata:
-        section_key = f"{occ['year']}_{occ.get('section', 'A')}"
-        if section_key not in section_occurrences:
-            section_occurrences[section_key] = []
-        section_occurrences[section_key].append(occ)
+        teacher_intervals[teacher].append(occ['interval'])
     
-    for section_key, occurrences in section_occurrences.items():
-        if len(occurrences) <= 1:
+    for teacher, intervals in teacher_intervals.items():
+        if len(intervals) >= 2:
+            model.AddNoOverlap(intervals)
+
+
+def apply_teacher_day_off_preference(model, occ_metadata, day_bounds):
+    """Soft constraint: each teacher should keep at least one working day free.
+
+    Returns a penalty literal per teacher that is true when the teacher ends up
+    teaching on every working day.
+    """
+    penalties = {}
+    if len(day_bounds) < 2:
+        return penalties
+
+    teacher_starts: Dict[str, List[Any]] = defaultdict(list)
+    for occ in occ_metadata:
+        teacher = occ.get('teacher', 'Unknown')
+        if teacher == 'None':
             continue
-            
-        for i in range(len(occurrences)):
-            for j in range(i + 1, len(occurrences)):
-                occ1 = occurrences[i]
-                occ2 = occurrences[j]
-                dur1 = occ1['duration']
-                dur2 = occ2['duration']
-                
-                for s1 in range(len(slot_names)):
-                    if (occ1['occ_id'], s1) not in start_at:
+        teacher_starts[teacher].append(occ['start'])
+
+    last_slot = day_bounds[-1][1]
+    for teacher, starts in teacher_starts.items():
+        teaches_on = []
+        for day_idx, (lo, hi) in enumerate(day_bounds):
+            on_day = model.NewBoolVar(f"{teacher}_teaches_d{day_idx}")
+            off_day = cp_model.Domain.FromIntervals([r for r in ([0, lo - 1], [hi + 1, last_slot]) if r[0] <= r[1]])
+            for start_var in starts:
+                model.AddLinearExpressionInDomain(start_var, off_day).OnlyEnforceIf(on_day.Not())
+            teaches_on.append(on_day)
+
+        no_day_off = model.NewBoolVar(f"{teacher}_no_day_off")
+        model.Add(sum(teaches_on) <= len(day_bounds) - 1 + no_day_off)
+        penalties[teacher] = no_day_off
+
+    return penalties
+
+
+def match_previous_starts(occ_metadata, previous_timetable, slot_index) -> Dict[int, int]:
+    """Map occurrences to the start slot they had in a previous timetable, where still allowed."""
+    previous_starts: Dict[Tuple[str, str, str, str], List[int]] = defaultdict(list)
+    for year, year_data in previous_timetable.items():
+        for section, section_data in year_data.items():
+            for day, day_schedule in section_data.items():
+                for item in day_schedule:
+                    start = slot_index.get(item['slot'])
+                    if start is None:
                         continue
-                    
-                    for s2 in range(len(slot_names)):
-                        if (occ2['occ_id'], s2) not in start_at:
-                            continue
-                        
-                        end1 = s1 + dur1
-                        end2 = s2 + dur2
-                        
-                        if not (end1 <= s2 or end2 <= s1):
-                            model.Add(start_at[(occ1['occ_id'], s1)] + start_at[(occ2['occ_id'], s2)] <= 1)
+                    previous_starts[(year, section, item['subject'], item['teacher'])].append(start)
 
+    matched: Dict[int, int] = {}
+    for occ in occ_metadata:
+        candidates = previous_starts.get((occ['year'], occ['section'], occ['subject'], occ['teacher']))
+        while candidates:
+            start = candidates.pop()
+            if start in occ['allowed']:
+                matched[occ['occ_id']] = start
+                break
+    return matched
+
+
+def build_greedy_hints(occ_metadata, preferred: Dict[int, int] = None) -> Dict[int, int]:
+    """Greedy construction heuristic used to warm-start the solver.
+
+    Occurrences with a preferred start (e.g. from the previous solution) are
+    placed there first when it is still free. The rest are placed most
+    constrained first (fewest allowed starts, then longest duration) at their
+    earliest start that keeps the teacher and the section free. Occurrences
+    that cannot be placed get no hint.
+    """
+    teacher_busy: Dict[str, set] = {}
+    section_busy: Dict[str, set] = {}
+    hints: Dict[int, int] = {}
+
+    def place(occ, candidates):
+        teacher = occ['teacher']
+        section_key = f"{occ['year']}_{occ['section']}"
+        if teacher not in teacher_busy:
+            teacher_busy[teacher] = set()
+        if section_key not in section_busy:
+            section_busy[section_key] = set()
+        # Free periods share the placeholder teacher 'None', which is never busy
+        t_busy = teacher_busy[teacher] if teacher != 'None' else set()
+        s_busy = section_busy[section_key]
+
+        for start in candidates:
+            covered = range(start, start + occ['duration'])
+            if any(slot in t_busy or slot in s_busy for slot in covered):
+                continue
+            t_busy.update(covered)
+            s_busy.update(covered)
+            hints[occ['occ_id']] = start
+            break
+
+    ordered = sorted(occ_metadata, key=lambda o: (len(o['allowed']), -o['duration']))
+    if preferred:
+        for occ in ordered:
+            if occ['occ_id'] in preferred:
+                place(occ, [preferred[occ['occ_id']]])
+    for occ in ordered:
+        if occ['occ_id'] not in hints:
+            place(occ, occ['allowed'])
+
+    return hints
 
+
+@st.cache_data(show_spinner=False, max_entries=8, hash_funcs={dict: _stable_digest})
 def generate_college_timetable_with_sections(constraints: Dict[str, Any], courses: List[Dict[str, Any]], 
                                             teachers: Dict[str, Any], sections: Dict[str, Any],
-                                            allow_free: bool = True, max_time_seconds: int = 30) -> Any:
-    """Generate college timetable with sections support."""
+                                            allow_free: bool = True, max_time_seconds: int = 30,
+                                            prefer_day_off: bool = False,
+                                            _previous_timetable: Dict[str, Any] = None) -> Any:
+    """Generate college timetable with sections support.
+
+    Returns {'timetable': year -> section -> day -> entries, 'soft_constraints': report or None},
+    or {'error': message}. The solver stops at the first valid timetable; with
+    `prefer_day_off` a short second pass then optimises the teacher day-off preference.
+
+    Results are cached on the content of all arguments, so identical inputs
+    return the previous solution without invoking the solver again.
+    `_previous_timetable` (excluded from the cache key) seeds the solver hints
+    so small edits re-solve close to the last result.
+    """
     if not constraints or not courses:
         return {'error': "No constraints or courses provided."}
 
@@ -688,20 +1193,17 @@ def generate_college_timetable_with_sections(constraints: Dict[str, Any], course
     num_slots = len(slot_names)
 
     # Calculate requirements per year-section combination
-    section_requirements = {}
+    section_requirements = Counter()
     for course in processed_courses:
-        section_key = f"{course['year']}_{course['section']}"
-        if section_key not in section_requirements:
-            section_requirements[section_key] = 0
-        section_requirements[section_key] += course['lectures'] * course['duration']
+        section_requirements[f"{course['year']}_{course['section']}"] += course['lectures'] * course['duration']
 
     # Add free periods
     if allow_free:
-        for year in ['Year1', 'Year2', 'Year3', 'Year4']:
+        for year in YEARS:
             year_sections = sections.get(year, {'A': {}})
             for section_name in year_sections.keys():
                 section_key = f"{year}_{section_name}"
-                section_used = section_requirements.get(section_key, 0)
+                section_used = section_requirements[section_key]
                 if section_used < num_slots:
                     free_needed = num_slots - section_used
                     processed_courses.append({
@@ -719,35 +1221,28 @@ def generate_college_timetable_with_sections(constraints: Dict[str, Any], course
     # Build CP-SAT model
     model = cp_model.CpModel()
     occ_metadata = []
-    start_at = {}
     occ_id = 0
 
+    # Slot metadata as aligned integer arrays for the feasibility scan and response build
+    day_index = {day: i for i, day in enumerate(dict.fromkeys(slot_to_day.values()))}
+    day_names = list(day_index)
+    slot_time_arr = np.fromiter(slot_time.values(), dtype=np.int32, count=num_slots)
+    slot_day_arr = np.fromiter((day_index[slot_to_day[n]] for n in slot_names), dtype=np.int32, count=num_slots)
+
+    compute_allowed = _allowed_starts_for_layout(tuple(slot_time_arr.tolist()), tuple(slot_day_arr.tolist()))
+
     # Create occurrences
     for course in processed_courses:
         name = course['name']
         dur = course['duration']
         
-        allowed_vals = []
-        for s in range(num_slots):
-            end_idx = s + dur - 1
-            if end_idx >= num_slots:
-                continue
-            if slot_to_day[slot_names[s]] != slot_to_day[slot_names[end_idx]]:
-                continue
-            
-            ok = True
-            for t in range(s, end_idx + 1):
-                if slot_time[t] < course['start_hr'] or slot_time[t] >= course['end_hr']:
-                    ok = False
-                    break
-            if ok:
-                allowed_vals.append(s)
+        allowed_vals, allowed_domain = compute_allowed(dur, course['start_hr'], course['end_hr'])
         
         if not allowed_vals and course['lectures'] > 0:
             return {'error': f"No feasible slots for {course['subject']} (Year {course['year']}, Section {course['section']})."}
 
         for k in range(course['lectures']):
-            start_var = model.NewIntVarFromDomain(cp_model.Domain.FromValues(allowed_vals), f"{name}_s{occ_id}")
+            start_var = model.NewIntVarFromDomain(allowed_domain, f"{name}_s{occ_id}")
             end_var = model.NewIntVar(min(allowed_vals) + dur, max(allowed_vals) + dur, f"{name}_e{occ_id}")
             interval = model.NewIntervalVar(start_var, dur, end_var, f"{name}_it{occ_id}")
             
@@ -759,68 +1254,96 @@ def generate_college_timetable_with_sections(constraints: Dict[str, Any], course
                 'section': course['section'],
                 'teacher': course['teacher'],
                 'duration': dur, 
+                'allowed': allowed_vals,
                 'start': start_var, 
                 'interval': interval
             })
 
-            for s in allowed_vals:
-                b = model.NewBoolVar(f"occ{occ_id}_start_at_{s}")
-                start_at[(occ_id, s)] = b
-                model.Add(start_var == s).OnlyEnforceIf(b)
-                model.Add(start_var != s).OnlyEnforceIf(b.Not())
-
             occ_id += 1
 
     # Apply constraints
     
     # 1. Section-based no-overlap
-    section_intervals = {}
+    section_intervals = defaultdict(list)
     for occ in occ_metadata:
-        section_key = f"{occ['year']}_{occ['section']}"
-        if section_key not in section_intervals:
-            section_intervals[section_key] = []
-        section_intervals[section_key].append(occ['interval'])
+        section_intervals[f"{occ['year']}_{occ['section']}"].append(occ['interval'])
     
     for section_key, intervals in section_intervals.items():
         if intervals:
             model.AddNoOverlap(intervals)
 
     # 2. Teacher conflict constraint
-    apply_teacher_conflict_constraint(model, occ_metadata, start_at, slot_names, teachers)
-    
-    # 3. Section conflict constraint (additional safety)
-    apply_section_constraint(model, occ_metadata, start_at, slot_names)
+    apply_teacher_conflict_constraint(model, occ_metadata, teachers)
+
+    # Warm start: keep previous placements where possible, fill the rest greedily
+    preferred = None
+    if _previous_timetable:
+        slot_index = {slot_name: i for i, slot_name in enumerate(slot_names)}
+        preferred = match_previous_starts(occ_metadata, _previous_timetable, slot_index)
+    hints = build_greedy_hints(occ_metadata, preferred)
+    for occ in occ_metadata:
+        if occ['occ_id'] in hints:
+            model.AddHint(occ['start'], hints[occ['occ_id']])
 
     # Solve
     solver = cp_model.CpSolver()
     solver.parameters.max_time_in_seconds = max_time_seconds
     solver.parameters.num_search_workers = 8
+    solver.parameters.search_branching = cp_model.PORTFOLIO_SEARCH
+    solver.parameters.cp_model_presolve = True
+    solver.parameters.linearization_level = 2
+    solver.parameters.symmetry_level = 2
 
     result = solver.Solve(model)
     if result not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
         return {'error': "No valid timetable found. Try adjusting constraints or reducing conflicts."}
 
+    starts = np.fromiter((solver.Value(occ['start']) for occ in occ_metadata), dtype=np.int32, count=len(occ_metadata))
+
+    # 3. Optional soft constraint: teachers keep a day off. Optimised in a short,
+    # bounded pass from the feasible solution; if it finds nothing, keep that solution
+    # and report the preference as not evaluated.
+    soft_report = None
+    if prefer_day_off:
+        day_firsts = np.flatnonzero(np.diff(slot_day_arr, prepend=-1))
+        day_lasts = np.append(day_firsts[1:] - 1, num_slots - 1)
+        day_bounds = list(zip(day_firsts.tolist(), day_lasts.tolist()))
+        day_off_penalties = apply_teacher_day_off_preference(model, occ_metadata, day_bounds)
+        soft_report = {'status': 'not evaluated'}
+        if day_off_penalties:
+            model.Minimize(sum(SOFT_CONSTRAINT_WEIGHTS['teacher_day_off'] * lit for lit in day_off_penalties.values()))
+            model.ClearHints()
+            for occ, start in zip(occ_metadata, starts.tolist()):
+                model.AddHint(occ['start'], start)
+            solver.parameters.max_time_in_seconds = min(max_time_seconds, SOFT_CONSTRAINT_MAX_SECONDS)
+            solver.parameters.relative_gap_limit = SOFT_CONSTRAINT_GAP_LIMIT
+            if solver.Solve(model) in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+                starts = np.fromiter((solver.Value(occ['start']) for occ in occ_metadata),
+                                     dtype=np.int32, count=len(occ_metadata))
+                soft_report = {
+                    'status': 'evaluated',
+                    'objective': int(solver.ObjectiveValue()),
+                    'teachers_without_day_off': sorted(t for t, lit in day_off_penalties.items() if solver.Value(lit)),
+                }
+
     # Build response organized by year, section, and day
     response_data = {}
-    for year in ['Year1', 'Year2', 'Year3', 'Year4']:
+    for year in YEARS:
         response_data[year] = {}
         year_sections = sections.get(year, {'A': {}})
         for section_name in year_sections.keys():
-            response_data[year][section_name] = {
-                day.lower(): [] for day in ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
-            }
+            response_data[year][section_name] = {day: [] for day in DAY_KEYS}
 
-    for occ in occ_metadata:
+    for occ, start_idx in zip(occ_metadata, starts.tolist()):
         subject = occ['subject']
         year = occ['year']
         section = occ['section']
         teacher = occ['teacher']
         dur = occ['duration']
-        start_idx = solver.Value(occ['start'])
         
         slot_name = slot_names[start_idx]
-        day = slot_to_day[slot_name]
-        start_hr = slot_time[start_idx]
+        day = day_names[slot_day_arr[start_idx]]
+        start_hr = int(slot_time_arr[start_idx])
         end_hr = start_hr + dur
         
         # Get room information from sections
@@ -829,48 +1352,430 @@ def generate_college_timetable_with_sections(constraints: Dict[str, Any], course
             room = sections[year][section].get('room', '')
         
         if year in response_data and section in response_data[year]:
-            response_data[year][section][day].append({
+            # Keep the slot index alongside the entry so ordering is an integer compare
+            response_data[year][section][day].append((start_idx, {
                 'slot': slot_name,
                 'subject': subject,
                 'teacher': teacher,
                 'section': section,
                 'room': room,
                 'start_time': f"{start_hr:02d}:00",
-                'end_time': f"{end_hr:02d}:00"
-            })
+                'end_time': f"{end_hr:02d}:00",
+                'is_free': subject == 'Free'
+            }))
 
-    # Sort schedules by time
+    # Sort schedules by time (slot indices increase with time within a day), then drop the index
+    by_slot = operator.itemgetter(0)
     for year in response_data:
         for section in response_data[year]:
-            for day in response_data[year][section]:
-                response_data[year][section][day].sort(key=lambda x: x['start_time'])
+            for day, entries in response_data[year][section].items():
+                response_data[year][section][day] = [entry for _, entry in sorted(entries, key=by_slot)]
+
+    return {'timetable': response_data, 'soft_constraints': soft_report}
+
+
+@st.cache_data(show_spinner=False, max_entries=16, hash_funcs={dict: _stable_digest})
+def compute_teacher_workload(courses, teachers) -> pd.DataFrame:
+    """Teacher workload preview table (courses, weekly hours, sections taught)."""
+    teacher_workload = defaultdict(lambda: {'courses': 0, 'hours': 0, 'sections': set()})
+    for course in courses:
+        workload = teacher_workload[course['teacher']]
+        workload['courses'] += 1
+        workload['hours'] += course['lectures'] * course['duration']
+        workload['sections'].add(f"{course['year']}-{course['section']}")
+
+    workload_data = []
+    for teacher, workload in teacher_workload.items():
+        teacher_info = teachers[teacher]
+        workload_data.append({
+            "Teacher": teacher,
+            "Department": teacher_info.get('department', 'N/A'),
+            "Courses": workload['courses'],
+            "Hours/Week": workload['hours'],
+            "Sections": len(workload['sections']),
+            "Section List": ', '.join(sorted(workload['sections']))
+        })
+    return pd.DataFrame(workload_data)
+
+
+@st.cache_data(show_spinner=False, max_entries=16, hash_funcs={dict: _stable_digest})
+def course_tables_by_year(courses, teachers, sections) -> Dict[str, List[Tuple[str, pd.DataFrame]]]:
+    """Course listing for the Add Courses tab: year -> [(section, table), ...]."""
+    # Group by year, then section, in one pass
+    courses_by_year = defaultdict(lambda: defaultdict(list))
+    for course in courses:
+        courses_by_year[course['year']][course['section']].append(course)
+
+    tables: Dict[str, List[Tuple[str, pd.DataFrame]]] = {}
+    for year in YEARS:
+        sections_in_year = courses_by_year.get(year)
+        if not sections_in_year:
+            continue
+
+        tables[year] = []
+        for section_name, section_courses in sections_in_year.items():
+            section_info = sections.get(year, {}).get(section_name, {})
+            course_data = []
+            for course in section_courses:
+                teacher_info = teachers.get(course['teacher'], {})
+                course_data.append({
+                    "Subject": course['subject'],
+                    "Code": course.get('subject_code', 'N/A'),
+                    "Teacher": course['teacher'],
+                    "Lectures/Week": f"{course['lectures']} × {course['duration']}h",
+                    "Room": section_info.get('room', 'TBD'),
+                    "Teacher Availability": f"{teacher_info.get('start_hr', 'N/A')}:00-{teacher_info.get('end_hr', 'N/A')}:00"
+                })
+            tables[year].append((section_name, pd.DataFrame(course_data)))
+    return tables
+
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def section_metrics(timetable_df: pd.DataFrame, year: str, section: str) -> Dict[str, Any]:
+    """Headline numbers for one section, read from the long-format timetable."""
+    rows = timetable_df[(timetable_df['year'] == year) & (timetable_df['section'] == section)]
+    is_free = rows['is_free']
+    classes = rows[~is_free]
+    # Every section carries all DAY_KEYS; reindex so empty days count and the first day wins ties
+    daily_classes = classes.groupby('day', observed=True).size().reindex(DAY_KEYS, fill_value=0)
+    return {
+        'total_classes': len(rows),
+        'free_periods': int(is_free.sum()),
+        'subjects': int(classes['subject'].nunique()),
+        'teachers': int(classes.loc[classes['teacher'] != 'None', 'teacher'].nunique()),
+        'busiest_day': daily_classes.idxmax(),
+    }
+
+
+@st.cache_data(show_spinner=False, max_entries=16, hash_funcs={dict: _stable_digest})
+def section_comparison_df(timetable_df: pd.DataFrame, year, section_order, sections) -> pd.DataFrame:
+    """Per-section totals for one year of the long-format timetable, in section_order."""
+    df = timetable_df[timetable_df['year'] == year]
+    is_free = df['is_free']
+    taught = ~is_free & (df['teacher'] != 'None')
+    stats = (
+        df.assign(free=is_free, taught_subject=df['subject'].where(taught), taught_teacher=df['teacher'].where(taught))
+        .groupby('section', sort=False, observed=True)
+        .agg(total=('subject', 'size'), free=('free', 'sum'),
+             subjects=('taught_subject', 'nunique'), teachers=('taught_teacher', 'nunique'))
+        .reindex(section_order, fill_value=0)
+    )
+
+    year_sections = sections.get(year, {})
+    return pd.DataFrame({
+        'Section': section_order,
+        'Room': [year_sections.get(name, {}).get('room', 'TBD') for name in section_order],
+        'Capacity': [year_sections.get(name, {}).get('capacity', 'N/A') for name in section_order],
+        'Total Classes': stats['total'].to_numpy(),
+        'Academic Classes': (stats['total'] - stats['free']).to_numpy(),
+        'Free Periods': stats['free'].to_numpy(),
+        'Subjects': stats['subjects'].to_numpy(),
+        'Teachers': stats['teachers'].to_numpy()
+    })
+
+
+DATAFRAME_DISPLAY_ROWS = 5000  # larger results show their head; the full data goes through downloads
+
+
+def show_metrics(metrics: Dict[str, Any]):
+    """One row of st.metric cards, one column per label -> value entry."""
+    for column, (label, value) in zip(st.columns(len(metrics)), metrics.items()):
+        column.metric(label, value)
+
+
+def show_dataframe(df: pd.DataFrame, max_rows: int = DATAFRAME_DISPLAY_ROWS, capped: bool = False):
+    """st.dataframe for result tables; only the first max_rows rows are sent to the browser.
+
+    `capped` marks a df that was itself cut at a row limit, so the caption shows "N+" rows.
+    """
+    if len(df) > max_rows or capped:
+        total = f"{len(df):,}+" if capped else f"{len(df):,}"
+        st.caption(f"Showing first {min(len(df), max_rows):,} of {total} rows")
+        st.dataframe(df.head(max_rows), hide_index=True)
+    else:
+        st.dataframe(df, use_container_width=True, hide_index=True)
+
+
+def report_json_bytes(report: Dict[str, Any]) -> bytes:
+    """Indented JSON for the analytics report download (orjson when installed)."""
+    if orjson is not None:
+        return orjson.dumps(
+            report, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        )
+    return json.dumps(report, indent=2).encode()
+
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def section_csv_bytes(timetable_df: pd.DataFrame, year: str, section: str) -> bytes:
+    """CSV export of one section's rows from the long-format timetable."""
+    rows = timetable_df[(timetable_df['year'] == year) & (timetable_df['section'] == section)]
+    if rows.empty:
+        return b""
+    return pd.DataFrame({
+        'Year': rows['year'],
+        'Section': rows['section'],
+        'Day': rows['day'].str.capitalize(),
+        'Time Slot': rows['slot'],
+        'Subject': rows['subject'],
+        'Teacher': rows['teacher'],
+        'Room': rows['room'],
+        'Start Time': rows['start_time'],
+        'End Time': rows['end_time']
+    }).to_csv(index=False).encode()
+
+
+@st.fragment
+def render_pre_generation_analysis(courses, teachers, sections):
+    """Pre-generation summary metrics and teacher workload preview."""
+    # Pre-generation analysis
+    st.subheader("📊 Pre-Generation Analysis")
+
+    # Section analysis
+    total_sections = sum(len(year_sections) for year_sections in sections.values())
+    total_courses = len(courses)
+
+    avg_courses_per_section = total_courses / total_sections if total_sections > 0 else 0
+    show_metrics({
+        "Total Sections": total_sections,
+        "Total Courses": total_courses,
+        "Teachers": len(teachers),
+        "Avg Courses/Section": f"{avg_courses_per_section:.1f}"
+    })
+
+    # Teacher workload preview (cached on the course and teacher data)
+    df_workload = compute_teacher_workload(courses, teachers)
+    if not df_workload.empty:
+        st.subheader("👥 Teacher Workload Preview")
+        st.dataframe(df_workload, use_container_width=True, hide_index=True)
+
+
+@st.fragment
+def render_results(timetable, timetable_df, display_df, sections):
+    """View Results body; as a fragment, year/section changes rerun only this part."""
+    # Year and section selection
+    col1, col2 = st.columns(2)
+    with col1:
+        selected_year = st.selectbox("Select Year", YEARS)
+    with col2:
+        available_sections = list(timetable.get(selected_year, {}).keys()) if selected_year in timetable else []
+        if available_sections:
+            selected_section = st.selectbox("Select Section", available_sections)
+        else:
+            st.warning(f"No sections found for {selected_year}")
+            return
+
+    if selected_year in timetable and selected_section in timetable[selected_year]:
+        section_schedule = timetable[selected_year][selected_section]
+
+        # Section-specific analysis
+        st.subheader(f"📊 {selected_year}-{selected_section} Analysis")
+
+        metrics = section_metrics(timetable_df, selected_year, selected_section)
+
+        show_metrics({
+            "Total Classes": metrics['total_classes'],
+            "Free Periods": metrics['free_periods'],
+            "Subjects": metrics['subjects'],
+            "Teachers": metrics['teachers'],
+            "Busiest Day": metrics['busiest_day']
+        })
+
+        # Section info
+        section_info = sections.get(selected_year, {}).get(selected_section, {})
+        if section_info:
+            st.info(f"📍 Room: {section_info.get('room', 'TBD')} | 👥 Capacity: {section_info.get('capacity', 'N/A')} students")
+
+        # Daily schedule display
+        st.subheader(f"📅 {selected_year}-{selected_section} Weekly Schedule")
+
+        days_with_classes = [day for day, schedule in section_schedule.items() if schedule]
+
+        if days_with_classes:
+            day_tabs = st.tabs([f"{day.capitalize()} ({len(section_schedule[day])})" for day in days_with_classes])
+            section_rows = display_df[(display_df['year'] == selected_year) & (display_df['section'] == selected_section)]
+            rows_by_day = dict(tuple(section_rows.groupby('day', sort=False, observed=True)))
 
-    return response_data
+            for i, day in enumerate(days_with_classes):
+                with day_tabs[i]:
+                    st.dataframe(rows_by_day[day][DISPLAY_COLUMNS], use_container_width=True, hide_index=True)
+
+    # Multi-Section Comparison
+    st.subheader("📊 Multi-Section Analysis")
+
+    if selected_year in timetable:
+        df_comparison = section_comparison_df(timetable_df, selected_year, tuple(timetable[selected_year]), sections)
+        if not df_comparison.empty:
+            st.dataframe(df_comparison, use_container_width=True, hide_index=True)
+
+    # Export options for current view
+    st.subheader("📤 Export Current View")
+    if st.button("📊 Export Section Schedule (CSV)"):
+        if selected_year in timetable and selected_section in timetable[selected_year]:
+            csv_bytes = section_csv_bytes(timetable_df, selected_year, selected_section)
+            if csv_bytes:
+                st.download_button(
+                    label="📥 Download CSV",
+                    data=csv_bytes,
+                    file_name=f"{selected_year}_{selected_section}_timetable.csv",
+                    mime="text/csv"
+                )
+
+
+@st.cache_data(show_spinner=False, max_entries=2)
+def read_db_bytes(path: str, mtime: float, size: int) -> bytes:
+    """Database file contents; mtime and size are part of the key so a rebuilt file is re-read."""
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+@st.fragment
+def render_db_download(db_path):
+    """Database download controls, rerun on their own when clicked."""
+    if st.button("📥 Download SQLite Database"):
+        st.download_button(
+            label="💾 Download Database File",
+            data=read_db_bytes(db_path, os.path.getmtime(db_path), os.path.getsize(db_path)),
+            file_name="college_timetable.db",
+            mime="application/octet-stream"
+        )
+
+
+@st.cache_data(show_spinner=False, max_entries=4, hash_funcs={dict: _stable_digest})
+def compute_analytics(timetable_df: pd.DataFrame, total_sections: int, teachers) -> Dict[str, Any]:
+    """Totals and tables for the Analytics tab, built once per timetable and teacher roster.
+
+    Reruns of the tab (the report button, switching tabs) reuse the cached
+    result. Tables keep first-seen order within equal counts, like the nested dict.
+    """
+    total_classes = len(timetable_df)
+    total_free_periods = int(timetable_df['is_free'].sum())
+    taught = timetable_df[~timetable_df['is_free']]
+    with_teacher = taught[taught['teacher'] != 'None']
+    section_labels = timetable_df['year'].astype(str) + '-' + timetable_df['section'].astype(str)
+
+    teacher_utilization = with_teacher.groupby('teacher', sort=False, observed=True).size().to_dict()
+    subject_distribution = taught.groupby('subject', sort=False, observed=True).size().to_dict()
+    # Every section carries all days, so days without classes still count (as 0), in week order
+    daily_load = (
+        taught.groupby(taught['day'].astype(DAY_ORDER), observed=False).size()
+        if total_sections else pd.Series(dtype='int64')
+    )
+    room_utilization = taught.groupby('room', sort=False, observed=True).size().to_dict()
+    # Distinct counts per teacher/subject/room; unique values only where a table lists them
+    teacher_years = with_teacher.groupby('teacher', observed=True)['year'].nunique().to_dict()
+    teacher_sections = (
+        with_teacher.drop_duplicates(['teacher', 'year', 'section']).groupby('teacher', observed=True).size().to_dict()
+    )
+    subject_years = taught.groupby('subject', observed=True)['year'].unique().to_dict()
+    subject_teachers = with_teacher.groupby('subject', observed=True)['teacher'].unique().to_dict()
+    room_sections = section_labels.groupby(timetable_df['room'], observed=True).unique().to_dict()
+    room_subjects = taught.groupby('room', observed=True)['subject'].nunique().to_dict()
+
+    teacher_data = []
+    for teacher, classes in sorted(teacher_utilization.items(), key=lambda x: x[1], reverse=True):
+        teacher_info = teachers.get(teacher, {})
+        teacher_data.append({
+            "Teacher": teacher,
+            "Department": teacher_info.get('department', 'Unknown'),
+            "Classes per Week": classes,
+            "Years Teaching": teacher_years[teacher],
+            "Sections": teacher_sections[teacher],
+            "Availability": f"{teacher_info.get('start_hr', 'N/A')}-{teacher_info.get('end_hr', 'N/A')}h"
+        })
+    top_teachers = heapq.nlargest(10, teacher_utilization.items(), key=operator.itemgetter(1))
+
+    subject_data = []
+    for subject, count in sorted(subject_distribution.items(), key=lambda x: x[1], reverse=True):
+        years = subject_years[subject]
+        subject_teacher_names = subject_teachers.get(subject, [])
+        subject_data.append({
+            "Subject": subject,
+            "Total Classes": count,
+            "Years Offered": len(years),
+            "Teachers": len(subject_teacher_names),
+            "Years List": ', '.join(sorted(years)),
+            "Teacher List": ', '.join(sorted(subject_teacher_names))
+        })
+
+    daily_df = pd.DataFrame()
+    busiest_lightest_day = None
+    if not daily_load.empty:
+        daily_df = pd.DataFrame({
+            "Day": daily_load.index.astype(str).str.capitalize(),
+            "Total Classes": daily_load.to_numpy(),
+            "Avg per Section": (daily_load / total_sections).map('{:.1f}'.format).to_numpy(),
+            "Load %": (daily_load / max(daily_load.sum(), 1) * 100).map('{:.1f}%'.format).to_numpy()
+        })
+        busiest_day, lightest_day = daily_load.idxmax(), daily_load.idxmin()
+        busiest_lightest_day = ((busiest_day, int(daily_load[busiest_day])), (lightest_day, int(daily_load[lightest_day])))
+
+    room_data = []
+    percent_per_class = 100 / total_classes if total_classes > 0 else 0
+    for room, usage in sorted(room_utilization.items(), key=lambda x: x[1], reverse=True):
+        room_data.append({
+            "Room": room,
+            "Usage (classes)": usage,
+            "Sections Using": len(room_sections[room]),
+            "Different Subjects": room_subjects[room],
+            "Section List": ', '.join(sorted(room_sections[room])),
+            "Utilization %": f"{usage * percent_per_class:.1f}%"
+        })
+
+    # Teacher conflicts: a teacher booked more than once at the same day/start time
+    teacher_clashes = (
+        with_teacher.assign(entry=section_labels[with_teacher.index] + ' (' + with_teacher['subject'].astype(str) + ')')
+        .groupby(['day', 'start_time', 'teacher'], sort=False, observed=True)['entry']
+        .agg(classes='size', details='; '.join)
+        .query('classes > 1')
+    )
+    conflicts_found = [
+        {
+            'Type': 'Teacher Conflict',
+            'Teacher/Resource': teacher,
+            'Time Slot': f"{day} {start_time}",
+            'Conflicting Classes': int(classes),
+            'Details': details
+        }
+        for (day, start_time, teacher), classes, details in zip(
+            teacher_clashes.index, teacher_clashes['classes'], teacher_clashes['details']
+        )
+    ]
+
+    return {
+        'totals': {
+            'total_sections': total_sections,
+            'total_classes': total_classes,
+            'total_free_periods': total_free_periods,
+            'utilization_rate': ((total_classes - total_free_periods) / total_classes * 100) if total_classes > 0 else 0,
+            'avg_classes_per_section': total_classes / total_sections if total_sections > 0 else 0
+        },
+        'teacher_df': pd.DataFrame(teacher_data),
+        'top_teachers_df': pd.DataFrame(
+            [(teacher, teachers.get(teacher, {}).get('department', 'Unknown'), classes)
+             for teacher, classes in top_teachers],
+            columns=['Teacher', 'Department', 'Classes/Week'],
+            index=pd.RangeIndex(1, len(top_teachers) + 1)
+        ),
+        'subject_df': pd.DataFrame(subject_data),
+        'daily_df': daily_df,
+        'busiest_lightest_day': busiest_lightest_day,
+        'room_df': pd.DataFrame(room_data),
+        'conflicts_df': pd.DataFrame(conflicts_found)
+    }
 
 
 def main():
     initialize_session_state()
 
+    # Streamlit drops elements a rerun does not re-emit, so the style block is sent every run
+    st.markdown(_CSS_HTML, unsafe_allow_html=True)
+
     # Header
-    st.markdown("""
-    <div class="main-header">
-        <h1>🎓 Enhanced College Timetable Generator</h1>
-        <p>Multi-Year • Multi-Section • SQLite Database • Advanced Analytics</p>
-    </div>
-    """, unsafe_allow_html=True)
+    st.markdown(_HEADER_HTML, unsafe_allow_html=True)
     
     # Enhanced features info
-    st.markdown("""
-    <div class="sqlite-feature">
-        🗄️ <strong>New SQLite Features:</strong> Database Export • Advanced Queries • Conflict Analysis • Performance Views
-    </div>
-    """, unsafe_allow_html=True)
-    
-    st.markdown("""
-    <div class="enhanced-feature">
-        📚 <strong>Section Management:</strong> Multiple Sections per Year • Room Assignment • Capacity Management • Section-wise Scheduling
-    </div>
-    """, unsafe_allow_html=True)
+    st.markdown(_SQLITE_FEATURE_HTML, unsafe_allow_html=True)
+    st.markdown(_SECTION_FEATURE_HTML, unsafe_allow_html=True)
 
     # Sidebar for navigation
     st.sidebar.title("🧭 Navigation")
@@ -890,117 +1795,80 @@ def main():
         
         st.markdown("Register teachers with their availability and departments.")
 
-        with st.form("teacher_form"):
+        with st.form("teacher_form", clear_on_submit=True):
             col1, col2 = st.columns(2)
             
             with col1:
-                teacher_name = st.text_input("Teacher Name", placeholder="e.g., Dr. Sarah Johnson")
-                department = st.text_input("Department", placeholder="e.g., Computer Science")
+                st.text_input("Teacher Name", placeholder="e.g., Dr. Sarah Johnson", key="teacher_name")
+                st.text_input("Department", placeholder="e.g., Computer Science", key="teacher_department")
                 
             with col2:
-                start_hr = st.number_input("Available From (Hour)", min_value=6, max_value=20, value=9)
-                end_hr = st.number_input("Available Until (Hour)", min_value=7, max_value=22, value=17)
+                st.number_input("Available From (Hour)", min_value=6, max_value=20, value=9, key="teacher_start_hr")
+                st.number_input("Available Until (Hour)", min_value=7, max_value=22, value=17, key="teacher_end_hr")
             
-            years_teaching = st.multiselect("Years Teaching", ["Year1", "Year2", "Year3", "Year4"], default=["Year1"])
+            st.multiselect("Years Teaching", YEARS, default=[YEARS[0]], key="teacher_years")
             
-            submitted = st.form_submit_button("Add Teacher")
-            
-            if submitted:
-                if teacher_name:
-                    st.session_state.teachers[teacher_name] = {
-                        "name": teacher_name,
-                        "department": department,
-                        "start_hr": start_hr,
-                        "end_hr": end_hr,
-                        "years": years_teaching
-                    }
-                    st.success(f"✅ Teacher '{teacher_name}' added successfully!")
-                else:
-                    st.error("❌ Please enter teacher name.")
+            st.form_submit_button("Add Teacher", on_click=add_teacher_submit)
+        show_form_notice()
 
         # Display teachers
         if st.session_state.teachers:
             st.subheader("Registered Teachers")
             for teacher_name, info in st.session_state.teachers.items():
-                st.markdown(f"""
-                <div class="constraint-box">
-                    <strong>{teacher_name}</strong> - {info['department']}<br>
-                    Available: {info['start_hr']}:00 - {info['end_hr']}:00<br>
-                    Teaching Years: {', '.join(info['years'])}
-                </div>
-                """, unsafe_allow_html=True)
+                st.markdown(
+                    _teacher_card_html(teacher_name, info['department'], info['start_hr'], info['end_hr'], info['years']),
+                    unsafe_allow_html=True
+                )
             
             if st.button("Clear All Teachers"):
                 st.session_state.teachers = {}
+                refresh_teachers_df()
                 st.rerun()
 
     elif tab == "Manage Sections":
         st.header("🏛️ Manage Sections")
         
-        st.markdown("""
-        <div class="section-header">
-            📋 Section Management System
-        </div>
-        """, unsafe_allow_html=True)
+        st.markdown(_SECTION_HEADER_HTML, unsafe_allow_html=True)
         
         st.markdown("Create and manage sections for each year with room assignments and capacity limits.")
 
         # Section creation form
-        with st.form("section_form"):
+        with st.form("section_form", clear_on_submit=True):
             col1, col2, col3, col4 = st.columns(4)
             
             with col1:
-                year = st.selectbox("Year", ["Year1", "Year2", "Year3", "Year4"])
+                st.selectbox("Year", YEARS, key="section_year")
             with col2:
-                section_name = st.text_input("Section Name", placeholder="e.g., A, B, C")
+                st.text_input("Section Name", placeholder="e.g., A, B, C", key="section_name")
             with col3:
-                capacity = st.number_input("Student Capacity", min_value=20, max_value=150, value=60)
+                st.number_input("Student Capacity", min_value=20, max_value=150, value=60, key="section_capacity")
             with col4:
-                room_number = st.text_input("Room Number", placeholder="e.g., CS-101")
+                st.text_input("Room Number", placeholder="e.g., CS-101", key="section_room")
             
-            submitted = st.form_submit_button("Add Section")
-            
-            if submitted:
-                if year and section_name:
-                    if year not in st.session_state.sections:
-                        st.session_state.sections[year] = {}
-                    
-                    st.session_state.sections[year][section_name.upper()] = {
-                        "capacity": capacity,
-                        "room": room_number,
-                        "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                    }
-                    st.success(f"✅ Section '{section_name.upper()}' added to {year}!")
-                else:
-                    st.error("❌ Please fill in year and section name.")
+            st.form_submit_button("Add Section", on_click=add_section_submit)
+        show_form_notice()
 
         # Display sections by year
-        if st.session_state.sections:
+        sections_df = st.session_state.sections_df
+        if not sections_df.empty:
             st.subheader("📚 Sections by Year")
             
-            for year in ["Year1", "Year2", "Year3", "Year4"]:
-                if year in st.session_state.sections and st.session_state.sections[year]:
-                    st.markdown(f"""
-                    <div class="year-box">
-                        <h4>📘 {year}</h4>
-                    </div>
-                    """, unsafe_allow_html=True)
-                    
-                    sections_data = []
-                    for section_name, section_info in st.session_state.sections[year].items():
-                        sections_data.append({
-                            "Section": section_name,
-                            "Capacity": section_info["capacity"],
-                            "Room": section_info["room"] or "TBD",
-                            "Created": section_info.get("created_at", "N/A")
-                        })
+            for year in YEARS:
+                year_rows = sections_df[sections_df['year'] == year]
+                if not year_rows.empty:
+                    st.markdown(_year_box_html(year), unsafe_allow_html=True)
                     
-                    if sections_data:
-                        df_sections = pd.DataFrame(sections_data)
-                        st.dataframe(df_sections, use_container_width=True, hide_index=True)
+                    df_sections = pd.DataFrame({
+                        "Section": year_rows['section'],
+                        "Capacity": year_rows['capacity'],
+                        "Room": year_rows['room'].where(year_rows['room'].astype(bool), "TBD"),
+                        "Created": year_rows['created_at']
+                    })
+                    st.dataframe(df_sections, use_container_width=True, hide_index=True)
 
             if st.button("Clear All Sections"):
                 st.session_state.sections = {}
+                refresh_sections_df()
                 st.rerun()
         else:
             st.info("No sections created yet. Add sections to organize your classes.")
@@ -1016,99 +1884,86 @@ def main():
             st.warning("⚠️ Please add sections first before creating courses.")
             return
 
-        with st.form("course_form"):
+        with st.expander("📥 Bulk Add Courses"):
+            with st.form("bulk_course_form", clear_on_submit=True):
+                bulk_rows = st.data_editor(
+                    pd.DataFrame({
+                        'subject': pd.Series(dtype='object'),
+                        'subject_code': pd.Series(dtype='object'),
+                        'year': pd.Series(dtype='object'),
+                        'section': pd.Series(dtype='object'),
+                        'teacher': pd.Series(dtype='object'),
+                        'lectures': pd.Series(dtype='Int64'),
+                        'duration': pd.Series(dtype='Int64')
+                    }),
+                    num_rows="dynamic",
+                    hide_index=True,
+                    use_container_width=True,
+                    column_config={
+                        'year': st.column_config.SelectboxColumn("year", options=YEARS),
+                        'teacher': st.column_config.SelectboxColumn("teacher", options=st.session_state.teachers_df['name'].tolist()),
+                        'lectures': st.column_config.NumberColumn("lectures", min_value=1, max_value=8, default=3),
+                        'duration': st.column_config.SelectboxColumn("duration", options=[1, 2, 3], default=1)
+                    }
+                )
+                if st.form_submit_button("Add All"):
+                    records, rejected = parse_course_rows(
+                        bulk_rows, st.session_state.teachers_df, st.session_state.sections_df
+                    )
+                    if records:
+                        add_courses_batch(records)
+                        st.success(f"✅ Added {len(records)} courses!")
+                    if rejected:
+                        st.error(f"❌ Skipped {rejected} rows with missing fields or unknown year/section/teacher.")
+
+        with st.form("course_form", clear_on_submit=True):
             col1, col2 = st.columns(2)
 
             with col1:
-                subject_name = st.text_input("Subject Name", placeholder="e.g., Data Structures")
-                year = st.selectbox("Year", ["Year1", "Year2", "Year3", "Year4"])
+                st.text_input("Subject Name", placeholder="e.g., Data Structures", key="course_subject")
+                year = st.selectbox("Year", YEARS, key="course_year")
                 
                 # Dynamic section selection based on year
-                available_sections = list(st.session_state.sections.get(year, {"A": {}}).keys())
+                available_sections = st.session_state.sections_by_year.get(year, [])
                 if available_sections:
-                    section = st.selectbox("Section", available_sections)
+                    st.selectbox("Section", available_sections, key="course_section")
                 else:
-                    section = st.text_input("Section", value="A", placeholder="No sections available for this year")
+                    st.text_input("Section", value="A", placeholder="No sections available for this year",
+                                  key="course_section_text")
                 
-                lectures_per_week = st.number_input("Lectures per Week", min_value=1, max_value=8, value=3)
+                st.number_input("Lectures per Week", min_value=1, max_value=8, value=3, key="course_lectures")
 
             with col2:
-                teacher_options = [t for t, info in st.session_state.teachers.items() 
-                                if year in info.get('years', [])]
+                teacher_options = st.session_state.teachers_by_year.get(year, [])
                 if not teacher_options:
                     st.error(f"No teachers available for {year}")
                     return
                     
-                teacher = st.selectbox("Teacher", teacher_options)
-                duration = st.selectbox("Duration per Lecture (hours)", [1, 2, 3], index=0)
-                subject_code = st.text_input("Subject Code", placeholder="e.g., CS301")
-
-            submitted = st.form_submit_button("Add Course")
-
-            if submitted:
-                if subject_name and teacher and section:
-                    course = {
-                        "subject": subject_name.strip(),
-                        "subject_code": subject_code.strip() or subject_name[:6].upper(),
-                        "year": year,
-                        "section": section,
-                        "teacher": teacher,
-                        "lectures": int(lectures_per_week),
-                        "duration": int(duration)
-                    }
-                    st.session_state.courses.append(course)
-                    st.success(f"✅ Course '{subject_name}' for {year}-{section} added successfully!")
-                else:
-                    st.error("❌ Please fill in all required fields.")
+                st.selectbox("Teacher", teacher_options, key="course_teacher")
+                st.selectbox("Duration per Lecture (hours)", [1, 2, 3], index=0, key="course_duration")
+                st.text_input("Subject Code", placeholder="e.g., CS301", key="course_code")
+
+            st.form_submit_button("Add Course", on_click=add_course_submit)
+        show_form_notice()
 
         # Display courses organized by year and section
         if st.session_state.courses:
             st.subheader("📖 Added Courses")
             
-            for year in ["Year1", "Year2", "Year3", "Year4"]:
-                year_courses = [c for c in st.session_state.courses if c['year'] == year]
-                if year_courses:
-                    st.markdown(f"""
-                    <div class="year-box">
-                        <h4>📘 {year}</h4>
-                    </div>
-                    """, unsafe_allow_html=True)
-                    
-                    # Group by section
-                    sections_in_year = {}
-                    for course in year_courses:
-                        section = course['section']
-                        if section not in sections_in_year:
-                            sections_in_year[section] = []
-                        sections_in_year[section].append(course)
-                    
-                    for section_name, section_courses in sections_in_year.items():
-                        st.markdown(f"""
-                        <div class="section-box">
-                            <h5>📚 Section {section_name}</h5>
-                        </div>
-                        """, unsafe_allow_html=True)
-                        
-                        course_data = []
-                        for course in section_courses:
-                            teacher_info = st.session_state.teachers.get(course['teacher'], {})
-                            section_info = st.session_state.sections.get(year, {}).get(section_name, {})
-                            
-                            course_data.append({
-                                "Subject": course['subject'],
-                                "Code": course.get('subject_code', 'N/A'),
-                                "Teacher": course['teacher'],
-                                "Lectures/Week": f"{course['lectures']} × {course['duration']}h",
-                                "Room": section_info.get('room', 'TBD'),
-                                "Teacher Availability": f"{teacher_info.get('start_hr', 'N/A')}:00-{teacher_info.get('end_hr', 'N/A')}:00"
-                            })
-                        
-                        df_courses = pd.DataFrame(course_data)
-                        st.dataframe(df_courses, use_container_width=True, hide_index=True)
+            course_tables = course_tables_by_year(
+                st.session_state.courses, st.session_state.teachers, st.session_state.sections
+            )
+            for year, section_tables in course_tables.items():
+                st.markdown(_year_box_html(year), unsafe_allow_html=True)
+                
+                for section_name, df_courses in section_tables:
+                    st.markdown(_section_box_html(section_name), unsafe_allow_html=True)
+                    st.dataframe(df_courses, use_container_width=True, hide_index=True)
 
             if st.button("Clear All Courses"):
                 st.session_state.courses = []
                 st.session_state.generated_timetable = None
+                refresh_timetable_df()
                 st.rerun()
 
     elif tab == "Set Constraints":
@@ -1116,30 +1971,38 @@ def main():
 
         # Working Days Configuration
         st.subheader("📅 Working Days Configuration")
-        working_days = []
 
-        days = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday"]
-
-        for day in days:
-            col1, col2, col3, col4 = st.columns(4)
-
-            with col1:
-                include_day = st.checkbox(f"Include {day}", key=f"include_{day}", value=True if day != "Saturday" else False)
-
-            if include_day:
-                with col2:
-                    start_hr = st.number_input(f"{day} Start", min_value=6, max_value=20, value=8, key=f"start_{day}")
-                with col3:
-                    end_hr = st.number_input(f"{day} End", min_value=7, max_value=22, value=18, key=f"end_{day}")
-                with col4:
-                    total_hours = st.number_input(f"Total Hours", min_value=1, max_value=12, value=8, key=f"total_{day}")
-
-                working_days.append({
-                    "day": day,
-                    "start_hr": str(int(start_hr)),
-                    "end_hr": str(int(end_hr)),
-                    "total_hours": str(int(total_hours))
-                })
+        days = DAYS[:6]  # Sunday is not offered as a working day
+
+        # One editor row per day instead of four widgets per day
+        days_df = st.data_editor(
+            pd.DataFrame({
+                'day': list(days),
+                'include': [day != "Saturday" for day in days],
+                'start_hr': [8] * len(days),
+                'end_hr': [18] * len(days),
+                'total_hours': [8] * len(days)
+            }),
+            num_rows="fixed",
+            hide_index=True,
+            use_container_width=True,
+            key="wd_editor",
+            column_config={
+                'day': st.column_config.TextColumn("Day", disabled=True),
+                'include': st.column_config.CheckboxColumn("Include"),
+                'start_hr': st.column_config.NumberColumn("Start", min_value=6, max_value=20, step=1),
+                'end_hr': st.column_config.NumberColumn("End", min_value=7, max_value=22, step=1),
+                'total_hours': st.column_config.NumberColumn("Total Hours", min_value=1, max_value=12, step=1)
+            }
+        )
+        hour_columns = ['start_hr', 'end_hr', 'total_hours']
+        working_days = (
+            days_df.loc[days_df['include'].fillna(False).astype(bool), ['day'] + hour_columns]
+            .fillna({'start_hr': 8, 'end_hr': 18, 'total_hours': 8})
+            .astype(dict.fromkeys(hour_columns, int))
+            .astype(dict.fromkeys(hour_columns, str))
+            .to_dict('records')
+        )
 
         # Enhanced Constraints
         st.subheader("🚀 Advanced Scheduling Options")
@@ -1181,50 +2044,9 @@ def main():
             st.error("❌ No constraints set. Please set constraints first.")
             return
 
-        # Pre-generation analysis
-        st.subheader("📊 Pre-Generation Analysis")
-        
-        # Section analysis
-        total_sections = sum(len(sections) for sections in st.session_state.sections.values())
-        total_courses = len(st.session_state.courses)
-        
-        col1, col2, col3, col4 = st.columns(4)
-        with col1:
-            st.metric("Total Sections", total_sections)
-        with col2:
-            st.metric("Total Courses", total_courses)
-        with col3:
-            st.metric("Teachers", len(st.session_state.teachers))
-        with col4:
-            avg_courses_per_section = total_courses / total_sections if total_sections > 0 else 0
-            st.metric("Avg Courses/Section", f"{avg_courses_per_section:.1f}")
-
-        # Teacher workload preview
-        teacher_workload = {}
-        for course in st.session_state.courses:
-            teacher = course['teacher']
-            if teacher not in teacher_workload:
-                teacher_workload[teacher] = {'courses': 0, 'hours': 0, 'sections': set()}
-            teacher_workload[teacher]['courses'] += 1
-            teacher_workload[teacher]['hours'] += course['lectures'] * course['duration']
-            teacher_workload[teacher]['sections'].add(f"{course['year']}-{course['section']}")
-
-        if teacher_workload:
-            st.subheader("👥 Teacher Workload Preview")
-            workload_data = []
-            for teacher, workload in teacher_workload.items():
-                teacher_info = st.session_state.teachers[teacher]
-                workload_data.append({
-                    "Teacher": teacher,
-                    "Department": teacher_info.get('department', 'N/A'),
-                    "Courses": workload['courses'],
-                    "Hours/Week": workload['hours'],
-                    "Sections": len(workload['sections']),
-                    "Section List": ', '.join(sorted(workload['sections']))
-                })
-            
-            df_workload = pd.DataFrame(workload_data)
-            st.dataframe(df_workload, use_container_width=True, hide_index=True)
+        render_pre_generation_analysis(
+            st.session_state.courses, st.session_state.teachers, st.session_state.sections
+        )
 
         # Generation options
         st.subheader("⚡ Generation Options")
@@ -1235,6 +2057,11 @@ def main():
         with col2:
             generate_sqlite = st.checkbox("Generate SQLite Database", value=True)
             include_analytics = st.checkbox("Include Analytics Views", value=True)
+            prefer_day_off = st.checkbox(
+                "Prefer a Day Off per Teacher", value=False,
+                help=f"After a valid timetable is found, spend up to {SOFT_CONSTRAINT_MAX_SECONDS}s "
+                     "rearranging it so each teacher keeps one working day free"
+            )
 
         # Generate button
         if st.button("🎯 Generate Enhanced Timetable", type="primary"):
@@ -1246,27 +2073,42 @@ def main():
                         st.session_state.teachers,
                         st.session_state.sections,
                         allow_free=allow_free,
-                        max_time_seconds=max_time
+                        max_time_seconds=max_time,
+                        prefer_day_off=prefer_day_off,
+                        _previous_timetable=st.session_state.generated_timetable
                     )
                 except Exception as e:
                     st.session_state.generated_timetable = None
+                    refresh_timetable_df()
                     st.session_state.last_error = str(e)
                     st.error(f"❌ Error during generation: {str(e)}")
                     return
 
                 if isinstance(result, dict) and result.get('error'):
                     st.session_state.generated_timetable = None
+                    refresh_timetable_df()
                     st.session_state.last_error = result['error']
                     st.error(f"❌ {result['error']}")
                 else:
-                    st.session_state.generated_timetable = result
+                    soft_report = result['soft_constraints']
+                    st.session_state.generated_timetable = result['timetable']
+                    refresh_timetable_df()
                     st.session_state.last_error = None
                     
+                    if soft_report and soft_report['status'] == 'not evaluated':
+                        st.info("ℹ️ Day-off preference not evaluated: no improved timetable was found "
+                                "in the optimisation pass, so the first valid timetable is kept.")
+                    elif soft_report and soft_report['teachers_without_day_off']:
+                        st.info(
+                            f"ℹ️ Soft constraints (penalty {soft_report['objective']}): "
+                            f"no day off for {', '.join(soft_report['teachers_without_day_off'])}"
+                        )
+                    
                     # Generate SQLite database if requested
                     if generate_sqlite:
                         try:
                             db_path = create_sqlite_database(
-                                result, 
+                                st.session_state.timetable_df,
                                 st.session_state.teachers, 
                                 st.session_state.sections, 
                                 st.session_state.courses
@@ -1286,170 +2128,12 @@ def main():
             st.warning("⚠️ No timetable generated yet.")
             return
 
-        timetable = st.session_state.generated_timetable
-
-        # Year and section selection
-        col1, col2 = st.columns(2)
-        with col1:
-            selected_year = st.selectbox("Select Year", ["Year1", "Year2", "Year3", "Year4"])
-        with col2:
-            available_sections = list(timetable.get(selected_year, {}).keys()) if selected_year in timetable else []
-            if available_sections:
-                selected_section = st.selectbox("Select Section", available_sections)
-            else:
-                st.warning(f"No sections found for {selected_year}")
-                return
-        
-        if selected_year in timetable and selected_section in timetable[selected_year]:
-            section_schedule = timetable[selected_year][selected_section]
-            
-            # Section-specific analysis
-            st.subheader(f"📊 {selected_year}-{selected_section} Analysis")
-            
-            total_classes = 0
-            free_periods = 0
-            subjects_count = {}
-            teachers_count = {}
-            daily_classes = {}
-            
-            for day, schedule in section_schedule.items():
-                daily_classes[day] = len([item for item in schedule if not item['subject'].startswith('Free')])
-                for item in schedule:
-                    total_classes += 1
-                    subject = item['subject']
-                    teacher = item['teacher']
-                    
-                    if subject.startswith("Free"):
-                        free_periods += 1
-                    else:
-                        subjects_count[subject] = subjects_count.get(subject, 0) + 1
-                        teachers_count[teacher] = teachers_count.get(teacher, 0) + 1
-
-            col1, col2, col3, col4, col5 = st.columns(5)
-            with col1:
-                st.metric("Total Classes", total_classes)
-            with col2:
-                st.metric("Free Periods", free_periods)
-            with col3:
-                st.metric("Subjects", len(subjects_count))
-            with col4:
-                st.metric("Teachers", len([t for t in teachers_count if t != 'None']))
-            with col5:
-                busiest_day = max(daily_classes, key=daily_classes.get) if daily_classes else "N/A"
-                st.metric("Busiest Day", busiest_day)
-
-            # Section info
-            section_info = st.session_state.sections.get(selected_year, {}).get(selected_section, {})
-            if section_info:
-                st.info(f"📍 Room: {section_info.get('room', 'TBD')} | 👥 Capacity: {section_info.get('capacity', 'N/A')} students")
-
-            # Daily schedule display
-            st.subheader(f"📅 {selected_year}-{selected_section} Weekly Schedule")
-            
-            days_with_classes = [day for day, schedule in section_schedule.items() if schedule]
-            
-            if days_with_classes:
-                day_tabs = st.tabs([f"{day.capitalize()} ({len(section_schedule[day])})" for day in days_with_classes])
-                
-                for i, day in enumerate(days_with_classes):
-                    with day_tabs[i]:
-                        schedule = section_schedule[day]
-                        
-                        if schedule:
-                            df_data = []
-                            for item in schedule:
-                                subject = item['subject']
-                                teacher = item['teacher']
-                                room = item.get('room', section_info.get('room', 'TBD'))
-                                
-                                visual_subject = subject
-                                if subject.startswith("Free"):
-                                    visual_subject = f"🆓 Free Period"
-                                    teacher_display = "—"
-                                elif item['start_time'].startswith('12:'):
-                                    visual_subject = f"🍽️ {subject}"
-                                    teacher_display = teacher
-                                else:
-                                    teacher_display = teacher
-                                
-                                df_data.append({
-                                    "Time": f"{item['start_time']} - {item['end_time']}",
-                                    "Subject": visual_subject,
-                                    "Teacher": teacher_display,
-                                    "Room": room,
-                                    "Slot": item['slot']
-                                })
-
-                            df = pd.DataFrame(df_data)
-                            st.dataframe(df, use_container_width=True, hide_index=True)
-                        else:
-                            st.info(f"No classes on {day.capitalize()}")
-
-        # Multi-Section Comparison
-        st.subheader("📊 Multi-Section Analysis")
-        
-        if selected_year in timetable:
-            comparison_data = []
-            for section_name, section_data in timetable[selected_year].items():
-                total_classes = sum(len(schedule) for schedule in section_data.values())
-                free_periods = sum(1 for day_schedule in section_data.values() 
-                                 for item in day_schedule if item['subject'].startswith("Free"))
-                academic_classes = total_classes - free_periods
-                
-                # Count unique teachers and subjects
-                section_teachers = set()
-                section_subjects = set()
-                for day_schedule in section_data.values():
-                    for item in day_schedule:
-                        if item['teacher'] != 'None' and not item['subject'].startswith("Free"):
-                            section_teachers.add(item['teacher'])
-                            section_subjects.add(item['subject'])
-                
-                section_info = st.session_state.sections.get(selected_year, {}).get(section_name, {})
-                
-                comparison_data.append({
-                    'Section': section_name,
-                    'Room': section_info.get('room', 'TBD'),
-                    'Capacity': section_info.get('capacity', 'N/A'),
-                    'Total Classes': total_classes,
-                    'Academic Classes': academic_classes,
-                    'Free Periods': free_periods,
-                    'Subjects': len(section_subjects),
-                    'Teachers': len(section_teachers)
-                })
-            
-            if comparison_data:
-                df_comparison = pd.DataFrame(comparison_data)
-                st.dataframe(df_comparison, use_container_width=True, hide_index=True)
-
-        # Export options for current view
-        st.subheader("📤 Export Current View")
-        if st.button("📊 Export Section Schedule (CSV)"):
-            if selected_year in timetable and selected_section in timetable[selected_year]:
-                csv_data = []
-                for day, schedule in timetable[selected_year][selected_section].items():
-                    for item in schedule:
-                        csv_data.append({
-                            'Year': selected_year,
-                            'Section': selected_section,
-                            'Day': day.capitalize(),
-                            'Time Slot': item['slot'],
-                            'Subject': item['subject'],
-                            'Teacher': item['teacher'],
-                            'Room': item.get('room', ''),
-                            'Start Time': item['start_time'],
-                            'End Time': item['end_time']
-                        })
-                
-                if csv_data:
-                    df_csv = pd.DataFrame(csv_data)
-                    csv_string = df_csv.to_csv(index=False)
-                    st.download_button(
-                        label="📥 Download CSV",
-                        data=csv_string,
-                        file_name=f"{selected_year}_{selected_section}_timetable.csv",
-                        mime="text/csv"
-                    )
+        render_results(
+            st.session_state.generated_timetable,
+            st.session_state.timetable_df,
+            st.session_state.display_df,
+            st.session_state.sections
+        )
 
     elif tab == "SQLite Database":
         st.header("🗄️ SQLite Database Management")
@@ -1458,11 +2142,7 @@ def main():
             st.warning("⚠️ No SQLite database generated yet. Generate a timetable with SQLite option enabled first.")
             return
 
-        st.markdown("""
-        <div class="sqlite-feature">
-            🎯 <strong>Database Features:</strong> Complete timetable data • Advanced queries • Performance analytics • Export capabilities
-        </div>
-        """, unsafe_allow_html=True)
+        st.markdown(_DB_FEATURE_HTML, unsafe_allow_html=True)
 
         # Database info
         if os.path.exists(st.session_state.sqlite_db_path):
@@ -1472,21 +2152,16 @@ def main():
         # Download database
         col1, col2 = st.columns(2)
         with col1:
-            if st.button("📥 Download SQLite Database"):
-                with open(st.session_state.sqlite_db_path, 'rb') as f:
-                    st.download_button(
-                        label="💾 Download Database File",
-                        data=f.read(),
-                        file_name="college_timetable.db",
-                        mime="application/octet-stream"
-                    )
+            render_db_download(st.session_state.sqlite_db_path)
 
         with col2:
             if st.button("🔄 Regenerate Database"):
                 if st.session_state.generated_timetable:
                     try:
+                        # Drop this session's cached build so the file is rebuilt
+                        create_sqlite_database.clear()
                         db_path = create_sqlite_database(
-                            st.session_state.generated_timetable,
+                            st.session_state.timetable_df,
                             st.session_state.teachers,
                             st.session_state.sections,
                             st.session_state.courses
@@ -1501,39 +2176,36 @@ def main():
         st.subheader("🔍 Pre-built Database Queries")
         
         sql_queries = generate_sql_export_queries()
-        query_names = {
-            "complete_timetable": "📋 Complete Timetable",
-            "teacher_conflicts": "⚠️ Teacher Conflicts",
-            "section_utilization": "📊 Section Utilization",
-            "daily_schedule_summary": "📅 Daily Schedule Summary", 
-            "teacher_schedule": "👨‍🏫 Teacher Schedules",
-            "workload_analysis": "💼 Workload Analysis"
-        }
 
         selected_query = st.selectbox("Select Query", 
-                                    options=list(query_names.keys()),
-                                    format_func=lambda x: query_names[x])
+                                    options=list(QUERY_NAMES.keys()),
+                                    format_func=lambda x: QUERY_NAMES[x])
 
         # Display selected query
-        st.subheader(f"📝 SQL Query: {query_names[selected_query]}")
+        st.subheader(f"📝 SQL Query: {QUERY_NAMES[selected_query]}")
         st.code(sql_queries[selected_query], language="sql")
 
         # Execute query
         if st.button("▶️ Execute Query"):
             try:
-                conn = sqlite3.connect(st.session_state.sqlite_db_path)
-                df_result = pd.read_sql_query(sql_queries[selected_query], conn)
-                conn.close()
+                df_result = run_sql_query(
+                    st.session_state.sqlite_db_path,
+                    sql_queries[selected_query],
+                    os.path.getmtime(st.session_state.sqlite_db_path)
+                )
                 
                 if not df_result.empty:
                     st.subheader("📊 Query Results")
-                    st.dataframe(df_result, use_container_width=True, hide_index=True)
+                    show_dataframe(df_result)
                     
                     # Export results
-                    csv_result = df_result.to_csv(index=False)
                     st.download_button(
                         label="📥 Download Results (CSV)",
-                        data=csv_result,
+                        data=query_csv_bytes(
+                            st.session_state.sqlite_db_path,
+                            sql_queries[selected_query],
+                            os.path.getmtime(st.session_state.sqlite_db_path)
+                        ),
                         file_name=f"{selected_query}_results.csv",
                         mime="text/csv"
                     )
@@ -1548,16 +2220,33 @@ def main():
         custom_query = st.text_area("Enter your SQL query:", 
                                    placeholder="SELECT * FROM timetable WHERE year = 'Year1' LIMIT 10;",
                                    height=100)
+        max_rows = st.number_input("Max rows", min_value=1, value=CUSTOM_QUERY_MAX_ROWS, step=1000)
         
         if st.button("🚀 Execute Custom Query") and custom_query:
             try:
-                conn = sqlite3.connect(st.session_state.sqlite_db_path)
-                df_custom = pd.read_sql_query(custom_query, conn)
-                conn.close()
+                df_custom = run_sql_query(
+                    st.session_state.sqlite_db_path,
+                    custom_query,
+                    os.path.getmtime(st.session_state.sqlite_db_path),
+                    int(max_rows)
+                )
                 
                 if not df_custom.empty:
                     st.subheader("🎯 Custom Query Results")
-                    st.dataframe(df_custom, use_container_width=True, hide_index=True)
+                    show_dataframe(df_custom.head(int(max_rows)), capped=len(df_custom) > max_rows)
+                    
+                    # Export every fetched row, including those past the display limit
+                    st.download_button(
+                        label="📥 Download Results (CSV)",
+                        data=query_csv_bytes(
+                            st.session_state.sqlite_db_path,
+                            custom_query,
+                            os.path.getmtime(st.session_state.sqlite_db_path),
+                            int(max_rows)
+                        ),
+                        file_name="custom_query_results.csv",
+                        mime="text/csv"
+                    )
                 else:
                     st.info("Query executed successfully but returned no results.")
                     
@@ -1590,6 +2279,8 @@ def main():
             
             **Views available:**
             - teacher_schedule - Complete teacher schedules with details
+
+            **Summary tables (built with the database):**
             - section_schedule - Section-wise schedules
             - teacher_workload - Teacher workload analysis
             """
@@ -1607,214 +2298,60 @@ def main():
         # Comprehensive Analytics Dashboard
         st.subheader("📊 Timetable Analytics Dashboard")
 
-        # Overall Statistics
-        total_sections = 0
-        total_classes = 0
-        total_free_periods = 0
-        teacher_utilization = {}
-        subject_distribution = {}
-        daily_load = {}
-        room_utilization = {}
-
-        for year, year_data in timetable.items():
-            for section, section_data in year_data.items():
-                total_sections += 1
-                for day, day_schedule in section_data.items():
-                    daily_load[day] = daily_load.get(day, 0) + len([item for item in day_schedule if not item['subject'].startswith('Free')])
-                    for item in day_schedule:
-                        total_classes += 1
-                        subject = item['subject']
-                        teacher = item['teacher']
-                        room = item.get('room', 'Unknown')
-                        
-                        if subject.startswith('Free'):
-                            total_free_periods += 1
-                        else:
-                            subject_distribution[subject] = subject_distribution.get(subject, 0) + 1
-                            if teacher != 'None':
-                                teacher_utilization[teacher] = teacher_utilization.get(teacher, 0) + 1
-                            if room != 'Unknown':
-                                room_utilization[room] = room_utilization.get(room, 0) + 1
+        analytics = compute_analytics(
+            st.session_state.timetable_df,
+            sum(len(year_data) for year_data in timetable.values()),
+            st.session_state.teachers
+        )
+        totals = analytics['totals']
 
         # Key Metrics
-        col1, col2, col3, col4, col5 = st.columns(5)
-        with col1:
-            st.metric("Total Sections", total_sections)
-        with col2:
-            st.metric("Total Classes", total_classes)
-        with col3:
-            st.metric("Free Periods", total_free_periods)
-        with col4:
-            utilization_rate = ((total_classes - total_free_periods) / total_classes * 100) if total_classes > 0 else 0
-            st.metric("Utilization Rate", f"{utilization_rate:.1f}%")
-        with col5:
-            avg_classes_per_section = total_classes / total_sections if total_sections > 0 else 0
-            st.metric("Avg Classes/Section", f"{avg_classes_per_section:.1f}")
+        show_metrics({
+            "Total Sections": totals['total_sections'],
+            "Total Classes": totals['total_classes'],
+            "Free Periods": totals['total_free_periods'],
+            "Utilization Rate": f"{totals['utilization_rate']:.1f}%",
+            "Avg Classes/Section": f"{totals['avg_classes_per_section']:.1f}"
+        })
 
         # Charts and Visualizations
         tab1, tab2, tab3, tab4 = st.tabs(["📊 Teacher Analysis", "📚 Subject Analysis", "📅 Daily Distribution", "🏛️ Room Analysis"])
 
         with tab1:
             st.subheader("👨‍🏫 Teacher Workload Analysis")
-            if teacher_utilization:
-                # Teacher workload chart data
-                teacher_data = []
-                for teacher, classes in sorted(teacher_utilization.items(), key=lambda x: x[1], reverse=True):
-                    teacher_info = st.session_state.teachers.get(teacher, {})
-                    # Count unique years this teacher teaches
-                    teacher_years = set()
-                    teacher_sections = set()
-                    for year, year_data in timetable.items():
-                        for section, section_data in year_data.items():
-                            for day, day_schedule in section_data.items():
-                                for item in day_schedule:
-                                    if item['teacher'] == teacher and not item['subject'].startswith('Free'):
-                                        teacher_years.add(year)
-                                        teacher_sections.add(f"{year}-{section}")
-                    
-                    teacher_data.append({
-                        "Teacher": teacher,
-                        "Department": teacher_info.get('department', 'Unknown'),
-                        "Classes per Week": classes,
-                        "Years Teaching": len(teacher_years),
-                        "Sections": len(teacher_sections),
-                        "Availability": f"{teacher_info.get('start_hr', 'N/A')}-{teacher_info.get('end_hr', 'N/A')}h"
-                    })
-                
-                df_teachers = pd.DataFrame(teacher_data)
-                st.dataframe(df_teachers, use_container_width=True, hide_index=True)
+            if not analytics['teacher_df'].empty:
+                show_dataframe(analytics['teacher_df'])
                 
                 # Top 10 busiest teachers
-                if len(teacher_data) > 0:
-                    st.subheader("🔥 Top 10 Busiest Teachers")
-                    top_teachers = sorted(teacher_utilization.items(), key=lambda x: x[1], reverse=True)[:10]
-                    for i, (teacher, classes) in enumerate(top_teachers, 1):
-                        dept = st.session_state.teachers.get(teacher, {}).get('department', 'Unknown')
-                        st.write(f"{i}. **{teacher}** ({dept}) - {classes} classes/week")
+                st.subheader("🔥 Top 10 Busiest Teachers")
+                st.table(analytics['top_teachers_df'])
 
         with tab2:
             st.subheader("📚 Subject Distribution Analysis")
-            if subject_distribution:
-                subject_data = []
-                for subject, count in sorted(subject_distribution.items(), key=lambda x: x[1], reverse=True):
-                    # Find which years/sections have this subject
-                    subject_years = set()
-                    subject_teachers = set()
-                    for year, year_data in timetable.items():
-                        for section, section_data in year_data.items():
-                            for day, day_schedule in section_data.items():
-                                for item in day_schedule:
-                                    if item['subject'] == subject:
-                                        subject_years.add(year)
-                                        if item['teacher'] != 'None':
-                                            subject_teachers.add(item['teacher'])
-                    
-                    subject_data.append({
-                        "Subject": subject,
-                        "Total Classes": count,
-                        "Years Offered": len(subject_years),
-                        "Teachers": len(subject_teachers),
-                        "Years List": ', '.join(sorted(subject_years)),
-                        "Teacher List": ', '.join(sorted(subject_teachers))
-                    })
-                
-                df_subjects = pd.DataFrame(subject_data)
-                st.dataframe(df_subjects, use_container_width=True, hide_index=True)
+            if not analytics['subject_df'].empty:
+                show_dataframe(analytics['subject_df'])
 
         with tab3:
             st.subheader("📅 Daily Load Distribution")
-            if daily_load:
-                daily_data = []
-                for day in ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]:
-                    if day.lower() in daily_load:
-                        classes = daily_load[day.lower()]
-                        # Calculate average per section
-                        avg_per_section = classes / total_sections if total_sections > 0 else 0
-                        daily_data.append({
-                            "Day": day,
-                            "Total Classes": classes,
-                            "Avg per Section": f"{avg_per_section:.1f}",
-                            "Load %": f"{(classes / sum(daily_load.values()) * 100):.1f}%" if daily_load else "0%"
-                        })
-                
-                df_daily = pd.DataFrame(daily_data)
-                st.dataframe(df_daily, use_container_width=True, hide_index=True)
+            if not analytics['daily_df'].empty:
+                show_dataframe(analytics['daily_df'])
                 
                 # Find busiest and lightest days
-                if daily_load:
-                    busiest_day = max(daily_load, key=daily_load.get)
-                    lightest_day = min(daily_load, key=daily_load.get)
-                    st.info(f"📈 Busiest Day: **{busiest_day.capitalize()}** ({daily_load[busiest_day]} classes) | 📉 Lightest Day: **{lightest_day.capitalize()}** ({daily_load[lightest_day]} classes)")
+                (busiest_day, busiest_classes), (lightest_day, lightest_classes) = analytics['busiest_lightest_day']
+                st.info(f"📈 Busiest Day: **{busiest_day.capitalize()}** ({busiest_classes} classes) | 📉 Lightest Day: **{lightest_day.capitalize()}** ({lightest_classes} classes)")
 
         with tab4:
             st.subheader("🏛️ Room Utilization Analysis")
-            if room_utilization:
-                room_data = []
-                for room, usage in sorted(room_utilization.items(), key=lambda x: x[1], reverse=True):
-                    # Find which sections use this room
-                    room_sections = set()
-                    room_subjects = set()
-                    for year, year_data in timetable.items():
-                        for section, section_data in year_data.items():
-                            for day, day_schedule in section_data.items():
-                                for item in day_schedule:
-                                    if item.get('room') == room:
-                                        room_sections.add(f"{year}-{section}")
-                                        if not item['subject'].startswith('Free'):
-                                            room_subjects.add(item['subject'])
-                    
-                    room_data.append({
-                        "Room": room,
-                        "Usage (classes)": usage,
-                        "Sections Using": len(room_sections),
-                        "Different Subjects": len(room_subjects),
-                        "Section List": ', '.join(sorted(room_sections)),
-                        "Utilization %": f"{(usage / total_classes * 100):.1f}%" if total_classes > 0 else "0%"
-                    })
-                
-                df_rooms = pd.DataFrame(room_data)
-                st.dataframe(df_rooms, use_container_width=True, hide_index=True)
+            if not analytics['room_df'].empty:
+                show_dataframe(analytics['room_df'])
             else:
                 st.info("No room data available. Rooms may not be assigned to sections.")
 
         # Conflict Analysis
         st.subheader("⚠️ Conflict Analysis")
-        conflicts_found = []
-        
-        # Check for teacher conflicts
-        teacher_conflicts = {}
-        for year, year_data in timetable.items():
-            for section, section_data in year_data.items():
-                for day, day_schedule in section_data.items():
-                    for item in day_schedule:
-                        teacher = item['teacher']
-                        if teacher != 'None' and not item['subject'].startswith('Free'):
-                            time_key = f"{day}_{item['start_time']}"
-                            if time_key not in teacher_conflicts:
-                                teacher_conflicts[time_key] = {}
-                            if teacher not in teacher_conflicts[time_key]:
-                                teacher_conflicts[time_key][teacher] = []
-                            teacher_conflicts[time_key][teacher].append({
-                                'year': year,
-                                'section': section,
-                                'subject': item['subject']
-                            })
-
-        for time_slot, teachers in teacher_conflicts.items():
-            for teacher, assignments in teachers.items():
-                if len(assignments) > 1:
-                    conflicts_found.append({
-                        'Type': 'Teacher Conflict',
-                        'Teacher/Resource': teacher,
-                        'Time Slot': time_slot.replace('_', ' '),
-                        'Conflicting Classes': len(assignments),
-                        'Details': '; '.join([f"{a['year']}-{a['section']} ({a['subject']})" for a in assignments])
-                    })
-
-        if conflicts_found:
+        if not analytics['conflicts_df'].empty:
             st.error("❌ Conflicts detected in the timetable:")
-            df_conflicts = pd.DataFrame(conflicts_found)
-            st.dataframe(df_conflicts, use_container_width=True, hide_index=True)
+            show_dataframe(analytics['conflicts_df'])
         else:
             st.success("✅ No conflicts detected! The timetable is optimally scheduled.")
 
@@ -1825,22 +2362,21 @@ def main():
             report_data = {
                 'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
                 'summary': {
-                    'total_sections': total_sections,
-                    'total_classes': total_classes,
-                    'total_free_periods': total_free_periods,
-                    'utilization_rate': utilization_rate
+                    'total_sections': totals['total_sections'],
+                    'total_classes': totals['total_classes'],
+                    'total_free_periods': totals['total_free_periods'],
+                    'utilization_rate': totals['utilization_rate']
                 },
-                'teacher_analysis': teacher_data if 'teacher_data' in locals() else [],
-                'subject_analysis': subject_data if 'subject_data' in locals() else [],
-                'daily_analysis': daily_data if 'daily_data' in locals() else [],
-                'room_analysis': room_data if 'room_data' in locals() else [],
-                'conflicts': conflicts_found
+                'teacher_analysis': analytics['teacher_df'].to_dict('records'),
+                'subject_analysis': analytics['subject_df'].to_dict('records'),
+                'daily_analysis': analytics['daily_df'].to_dict('records'),
+                'room_analysis': analytics['room_df'].to_dict('records'),
+                'conflicts': analytics['conflicts_df'].to_dict('records')
             }
             
-            report_json = json.dumps(report_data, indent=2)
             st.download_button(
                 label="📥 Download Analytics Report (JSON)",
-                data=report_json,
+                data=report_json_bytes(report_data),
                 file_name=f"timetable_analytics_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
                 mime="application/json"
             )
@@ -0,0 +1,61 @@
+"""Numeric kernels used by the timetable solver in newgenerator.py.
+
+Everything here works on flat NumPy integer arrays (slot hours, day codes)
+so it can be compiled with Numba when it is installed.
+Without Numba the same functions run as plain Python / NumPy.
+"""
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:  # numba is optional; kernels fall back to plain Python / NumPy
+    NUMBA_AVAILABLE = False
+
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
+
+@njit(cache=True)
+def slot_start_hours(day_hours: np.ndarray, day_starts: np.ndarray) -> np.ndarray:
+    """Start hour of every slot, day after day, skipping the 12:00 lunch hour."""
+    out = np.empty(day_hours.sum(), dtype=np.int32)
+    idx = 0
+    for d in range(day_hours.shape[0]):
+        start = day_starts[d]
+        for j in range(day_hours[d]):
+            # Skip lunch hour if it would fall here
+            while start == 12:
+                start += 1
+            out[idx] = start
+            idx += 1
+            start += 1
+    return out
+
+
+if NUMBA_AVAILABLE:
+    @njit(cache=True)
+    def allowed_start_mask(slot_time_arr: np.ndarray, slot_day_arr: np.ndarray, dur: int, sh: int, eh: int) -> np.ndarray:
+        """Mask of start slots whose `dur` consecutive slots stay on one day inside [sh, eh)."""
+        n_starts = slot_time_arr.shape[0] - dur + 1
+        ok = np.zeros(n_starts, dtype=np.bool_)
+        for s in range(n_starts):
+            if slot_day_arr[s] != slot_day_arr[s + dur - 1]:
+                continue
+            fits = True
+            for t in range(s, s + dur):
+                if slot_time_arr[t] < sh or slot_time_arr[t] >= eh:
+                    fits = False
+                    break
+            ok[s] = fits
+        return ok
+else:
+    def allowed_start_mask(slot_time_arr: np.ndarray, slot_day_arr: np.ndarray, dur: int, sh: int, eh: int) -> np.ndarray:
+        """Mask of start slots whose `dur` consecutive slots stay on one day inside [sh, eh)."""
+        n_starts = slot_time_arr.shape[0] - dur + 1
+        windows = sliding_window_view(slot_time_arr, dur)
+        return ((windows >= sh) & (windows < eh)).all(axis=1) & (slot_day_arr[:n_starts] == slot_day_arr[dur - 1:])
+